@@ -0,0 +1,90 @@
+"""
+Bytes on the wire and handler time for /maps/heatmap, before and after the compressed ETag cache.
+
+    python backend/benchmarks/bench_heatmap_http.py --rows 200000 --requests 50
+
+"before" replays what the route used to do: hand Flask the raw folium HTML string.
+Data comes from synthetic_data.py, like bench_suite.py.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from flask import Response
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+from synthetic_data import cached_dataset  # noqa: E402
+
+
+def load_synthetic_main(rows):
+    """import main against the synthetic parquet and geojson and wait for its first load"""
+    parquet_path, geojson_path = cached_dataset(rows)
+    os.environ["LOCAL_PARQUET_PATH"] = parquet_path
+    os.environ["LOCAL_GEOJSON_PATH"] = geojson_path
+    # a fresh snapshot dir so every run times a full build, not a restore
+    os.environ["SNAPSHOT_DIR"] = os.path.join(tempfile.mkdtemp(prefix="camp-bench-"), "snapshots")
+    # the prewarm thread would race the timed requests and fail at exit once the pool shuts down
+    os.environ["PREWARM_MAPS"] = "0"
+    import main
+
+    main.startup_load_job.wait()
+    return main
+
+
+def run(client, n, headers=None):
+    sizes = []
+    start = time.perf_counter()
+    for _ in range(n):
+        response = client.get("/maps/heatmap?category=ASSAULT", headers=headers or {})
+        sizes.append(len(response.get_data()))
+    elapsed = (time.perf_counter() - start) / n
+    return response, int(np.mean(sizes)), elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    app_module = load_synthetic_main(args.rows)
+    app = app_module.app
+    html = app_module.dataset.renderer.get("ASSAULT").encodings["identity"]
+
+    # the route as it was: raw string, no validators, no compression
+    app.add_url_rule("/bench/before", "bench_before", lambda: Response(html, mimetype="text/html"))
+    client = app.test_client()
+
+    results = []
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        before_bytes = len(client.get("/bench/before").get_data())
+    results.append(("before (raw html)", before_bytes, (time.perf_counter() - start) / args.requests))
+
+    # first hit compresses, keep it out of the steady state numbers
+    client.get("/maps/heatmap?category=ASSAULT", headers={"Accept-Encoding": "br, gzip"})
+
+    _, size, elapsed = run(client, args.requests)
+    results.append(("after identity", size, elapsed))
+    _, size, elapsed = run(client, args.requests, {"Accept-Encoding": "gzip"})
+    results.append(("after gzip", size, elapsed))
+    response, size, elapsed = run(client, args.requests, {"Accept-Encoding": "br, gzip"})
+    results.append((f"after {response.headers.get('Content-Encoding', 'identity')}", size, elapsed))
+
+    etag = response.headers["ETag"]
+    response, size, elapsed = run(client, args.requests, {"Accept-Encoding": "br, gzip", "If-None-Match": etag})
+    assert response.status_code == 304
+    results.append(("after revalidation (304)", size, elapsed))
+
+    print(f"{'variant':<28} {'bytes':>12} {'ms/request':>12}")
+    for label, size, elapsed in results:
+        print(f"{label:<28} {size:>12,} {elapsed * 1000:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Cost of picking a geoguesser round location: df.sample plus the inline ZIP stats
+and street view url (before) against LocationSampler (after).
+
+    python backend/benchmarks/bench_location_sampler.py --rows 2700000 --draws 2000
+
+Rows come from synthetic_data.py and go through the server's load steps, so the frame has the
+compact resident columns the sampler is built over.
+"""
+import argparse
+import os
+import sys
+import time
+
+import geopandas as gpd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+from crime_categories import add_category_bits  # noqa: E402
+from data_loader import read_crime_parquet, resident_frame  # noqa: E402
+from location_sampler import LocationSampler  # noqa: E402
+from nta_join import row_nta_codes  # noqa: E402
+from synthetic_data import cached_dataset  # noqa: E402
+from zip_index import CRIME_TYPES, build_zip_crime_index  # noqa: E402
+
+COLORS = {
+    "Shooting": "#EF553B", "Robbery": "#636EFA", "Burglary": "#AB63FA",
+    "Theft (non vehicle)": "#FECB52", "Vehicle theft": "#FFA15A", "Assault": "#00CC96",
+    "Harassment": "#19D3F3", "Drug": "#FF6692", "Vandalism": "#B6E880",
+}
+
+
+def synthetic_frame(rows):
+    """resident frame and per NTA boroughs, loaded the way load_fresh_dataset does"""
+    parquet_path, geojson_path = cached_dataset(rows)
+    shapes = gpd.read_file(geojson_path)
+    df = read_crime_parquet(parquet_path)
+    add_category_bits(df)
+    df["NTA_CODE"] = row_nta_codes(df, shapes)
+    return resident_frame(df), shapes["BoroName"].to_numpy()
+
+
+def old_location(df, zip_index):
+    """what get_random_location used to do"""
+    row = df.sample(n=1).iloc[0]
+    zip_code = row["ZIPCODE"]
+    crime_stats = [
+        {"crime_type": t, "count": int(n), "color": COLORS[t]}
+        for t, n in zip(CRIME_TYPES, zip_index.get(zip_code, ()))
+        if n > 0
+    ]
+    url = f"https://maps.googleapis.com/maps/api/streetview?size=600x400&location={row['Latitude']},{row['Longitude']}&key=KEY"
+    return {
+        "latitude": float(row["Latitude"]), "longitude": float(row["Longitude"]),
+        "street_view_url": url, "zip_code": str(zip_code), "crime_stats": crime_stats,
+    }
+
+
+def per_call(fn, n):
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter() - start) / n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_700_000)
+    parser.add_argument("--draws", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    df, nta_boroughs = synthetic_frame(args.rows)
+    zip_index = build_zip_crime_index(df)
+
+    start = time.perf_counter()
+    sampler = LocationSampler.build(df, nta_boroughs, zip_index, street_view_key="KEY")
+    build_s = time.perf_counter() - start
+    stratum = sampler.parse_stratum({"borough": "Queens", "difficulty": "hard"})
+
+    old_draws = max(1, args.draws // 20)
+    results = [
+        ("df.sample (before)", per_call(lambda i: old_location(df, zip_index), old_draws)),
+        ("sampler", per_call(lambda i: sampler.sample(), args.draws)),
+        ("sampler, stratum", per_call(lambda i: sampler.sample(stratum), args.draws)),
+        ("sampler, seeded", per_call(lambda i: sampler.sample(seed=42, round_no=i), args.draws)),
+    ]
+
+    print(f"{args.rows:,} rows, sampler built in {build_s:.2f}s over {len(sampler):,} valid locations")
+    print(f"{'variant':<24} {'us/round':>12}")
+    for label, seconds in results:
+        print(f"{label:<24} {seconds * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+How late the gevent loop gets to a ready greenlet (i.e. a socket handler) while a heavy job
+runs, with the job inline on the loop (before) and on the WorkerPool (after).
+
+    python backend/benchmarks/bench_loop_latency.py --points 2000000
+
+A heartbeat greenlet asks to wake every --interval ms, its lateness is what a ping or a
+submit_guess would wait on top of its own work.
+"""
+from gevent import monkey
+
+monkey.patch_all()
+
+import argparse  # noqa: E402
+import os  # noqa: E402
+import sys  # noqa: E402
+import time  # noqa: E402
+
+import gevent  # noqa: E402
+import numpy as np  # noqa: E402
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+from bench_nta_join import synthetic_points, synthetic_shapes  # noqa: E402
+from http_cache import CompressedBody  # noqa: E402
+from map_render import render_choropleth  # noqa: E402
+from nta_join import NTAIndex  # noqa: E402
+from worker_pool import WorkerPool  # noqa: E402
+
+
+def heavy_job(shapes, lon, lat):
+    """roughly what a reload + first map render does: NTA join, counts, folium, brotli"""
+    codes = NTAIndex(shapes).assign(lon, lat)
+    counts = np.bincount(codes[codes >= 0], minlength=len(shapes))
+    series = shapes.assign(count=counts).set_index("NTA2020")["count"]
+    return CompressedBody(render_choropleth(shapes, series, "ASSAULT"))
+
+
+def measure(job, interval):
+    lags = []
+    running = True
+
+    def heartbeat():
+        while running:
+            start = time.perf_counter()
+            gevent.sleep(interval)
+            lags.append(time.perf_counter() - start - interval)
+
+    beat = gevent.spawn(heartbeat)
+    gevent.sleep(interval * 5)
+    start = time.perf_counter()
+    gevent.spawn(job).join()
+    elapsed = time.perf_counter() - start
+    running = False
+    beat.join()
+    lags = np.array(lags) * 1000
+    return elapsed, np.percentile(lags, 50), np.percentile(lags, 99), lags.max()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, default=2_000_000)
+    parser.add_argument("--interval", type=float, default=5, help="heartbeat interval in ms")
+    args = parser.parse_args(argv)
+
+    shapes = synthetic_shapes().assign(NTAName=lambda g: g["NTA2020"])
+    lon, lat = synthetic_points(args.points)
+    pool = WorkerPool()
+    assert pool.uses_gevent
+    interval = args.interval / 1000
+
+    results = [
+        ("inline (before)", measure(lambda: heavy_job(shapes, lon, lat), interval)),
+        ("worker pool (after)", measure(lambda: pool.run(heavy_job, shapes, lon, lat), interval)),
+    ]
+    pool.close()
+
+    print(f"heavy job: NTA join of {args.points:,} points + folium render + brotli")
+    print(f"{'variant':<22} {'job s':>8} {'p50 lag ms':>11} {'p99 lag ms':>11} {'max lag ms':>11}")
+    for label, (elapsed, p50, p99, worst) in results:
+        print(f"{label:<22} {elapsed:>8.2f} {p50:>11.2f} {p99:>11.2f} {worst:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Resident and peak memory of the loaded crime data, the old frame layout against the compact one.
+
+    python backend/benchmarks/bench_memory.py --rows 1000000
+
+"before" keeps alive what making_heatmap used to: df as pandas read it (float64, object
+strings), df_gdf with a shapely Point per row, df_with_shapes from gpd.sjoin and nine
+filtered category frames. "after" is the load the server does now: compact resident columns,
+NTA x category counts, the crime cube, the ZIP index, the location sampler, the density tiles
+and the spatial index.
+Data comes from synthetic_data.py, like bench_suite.py.
+Each variant runs in its own process so neither inherits the other's heap, resident is RSS
+growth after the load with freed allocator memory handed back, peak is the high water mark.
+"""
+import argparse
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import geopandas as gpd
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+from crime_categories import CATEGORY_RULES, MAP_CATEGORIES, add_category_bits  # noqa: E402
+from crime_cube import CrimeCube  # noqa: E402
+from data_loader import read_crime_parquet, release_free_memory, resident_frame  # noqa: E402
+from density_tiles import DensityTiles  # noqa: E402
+from location_sampler import LocationSampler  # noqa: E402
+from map_data import nta_category_counts  # noqa: E402
+from nta_join import row_nta_codes  # noqa: E402
+from spatial_index import SpatialIndex  # noqa: E402
+from synthetic_data import cached_dataset  # noqa: E402
+from zip_index import build_zip_crime_index  # noqa: E402
+
+def rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def load_before(path, shapes):
+    df = pd.read_parquet(path)
+    df_gdf = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df["Longitude"], df["Latitude"]), crs="EPSG:4326")
+    df_with_shapes = gpd.sjoin(df_gdf, shapes, how="inner", predicate="intersects")
+    categories = {}
+    for cat in MAP_CATEGORIES:
+        rules = CATEGORY_RULES[cat]
+        mask = df_with_shapes["TYP_DESC"].str.contains("|".join(rules["include"]), case=False, na=False)
+        if rules["exclude"]:
+            mask &= ~df_with_shapes["TYP_DESC"].str.contains("|".join(rules["exclude"]), case=False, na=False)
+        categories[cat] = df_with_shapes[mask]
+    return [df, df_gdf, df_with_shapes, categories]
+
+
+def load_after(path, shapes):
+    # the same steps load_fresh_dataset / derive_map_data run
+    df = read_crime_parquet(path)
+    add_category_bits(df)
+    zip_index = build_zip_crime_index(df)
+    df["NTA_CODE"] = row_nta_codes(df, shapes)
+    nta_ids = shapes["NTA2020"].to_numpy()
+    boroughs = shapes["BoroName"].to_numpy()
+    nta_counts = nta_category_counts(df["NTA_CODE"], df["CRIME_BITS"], nta_ids, MAP_CATEGORIES)
+    cube = CrimeCube.build(df, nta_ids, boroughs, MAP_CATEGORIES)
+    df = resident_frame(df)
+    sampler = LocationSampler.build(df, boroughs, zip_index)
+    tiles = DensityTiles.build(df, MAP_CATEGORIES)
+    spatial = SpatialIndex.build(df)
+    return [df, nta_counts, cube, zip_index, sampler, tiles, spatial]
+
+
+def run_variant(variant, path, geojson_path):
+    """child process: load one way, report resident growth and peak"""
+    shapes = gpd.read_file(geojson_path)
+    gc.collect()
+    release_free_memory()
+    start = rss_bytes()
+    started = time.perf_counter()
+    kept = (load_before if variant == "before" else load_after)(path, shapes)
+    elapsed = time.perf_counter() - started
+    # both variants get the trim the server does after a load, so only live data is counted
+    gc.collect()
+    release_free_memory()
+    resident = rss_bytes() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 - start
+    frame_bytes = int(kept[0].memory_usage(deep=True).sum())
+    print(json.dumps({"resident": resident, "peak": peak, "frame": frame_bytes, "seconds": elapsed}))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--variant", choices=["before", "after"], help=argparse.SUPPRESS)
+    parser.add_argument("--parquet", help=argparse.SUPPRESS)
+    parser.add_argument("--geojson", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.variant:
+        run_variant(args.variant, args.parquet, args.geojson)
+        return
+
+    path, geojson_path = cached_dataset(args.rows)
+    print(f"{args.rows:,} rows, parquet {os.path.getsize(path) / 1e6:.1f} MB")
+
+    results = {}
+    for variant in ("before", "after"):
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--variant", variant, "--parquet", path,
+             "--geojson", geojson_path],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results[variant] = json.loads(out.strip().splitlines()[-1])
+
+    print(f"{'variant':<8} {'resident MB':>12} {'peak MB':>10} {'df MB':>8} {'bytes/row':>10} {'load s':>8}")
+    for variant, r in results.items():
+        print(
+            f"{variant:<8} {r['resident'] / 1e6:>12.1f} {r['peak'] / 1e6:>10.1f} {r['frame'] / 1e6:>8.1f}"
+            f" {r['resident'] / args.rows:>10.1f} {r['seconds']:>8.2f}"
+        )
+    before, after = results["before"], results["after"]
+    print(f"resident {before['resident'] / max(after['resident'], 1):.1f}x smaller, "
+          f"peak {before['peak'] / max(after['peak'], 1):.1f}x smaller")
+
+
+if __name__ == "__main__":
+    main()
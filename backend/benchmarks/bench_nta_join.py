@@ -0,0 +1,94 @@
+"""
+NTAIndex vs the gpd.sjoin making_heatmap used to run, on synthetic NTA-like shapes.
+
+    python backend/benchmarks/bench_nta_join.py --rows 2000000 --processes 4
+
+Shapes are ~260 Voronoi cells clipped to the NYC bounding box (NYC has 262 NTAs),
+points are uniform over a slightly larger box so some fall outside every shape.
+"""
+import argparse
+import os
+import sys
+import time
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from nta_join import NTAIndex  # noqa: E402
+
+NYC_BOUNDS = (-74.26, 40.49, -73.70, 40.92)
+
+
+def synthetic_shapes(n_shapes=260, seed=0):
+    rng = np.random.default_rng(seed)
+    min_x, min_y, max_x, max_y = NYC_BOUNDS
+    seeds = shapely.multipoints(np.column_stack([
+        rng.uniform(min_x, max_x, n_shapes),
+        rng.uniform(min_y, max_y, n_shapes),
+    ]))
+    frame = shapely.box(*NYC_BOUNDS)
+    cells = shapely.get_parts(shapely.voronoi_polygons(seeds, extend_to=frame))
+    cells = shapely.intersection(cells, frame)
+    return gpd.GeoDataFrame(
+        {"NTA2020": [f"NT{i:03d}" for i in range(len(cells))]},
+        geometry=cells,
+        crs="EPSG:4326",
+    )
+
+
+def synthetic_points(n_rows, seed=1):
+    rng = np.random.default_rng(seed)
+    min_x, min_y, max_x, max_y = NYC_BOUNDS
+    lon = rng.uniform(min_x - 0.05, max_x + 0.05, n_rows).astype(np.float32)
+    lat = rng.uniform(min_y - 0.05, max_y + 0.05, n_rows).astype(np.float32)
+    return lon, lat
+
+
+def sjoin_codes(shapes, lon, lat):
+    """what making_heatmap did before NTAIndex"""
+    points = gpd.GeoDataFrame(geometry=gpd.points_from_xy(lon, lat), crs="EPSG:4326")
+    joined = gpd.sjoin(points, shapes, how="inner", predicate="intersects")
+    codes = np.full(len(lon), -1, dtype=np.int16)
+    joined = joined[~joined.index.duplicated(keep="first")]
+    codes[joined.index.to_numpy()] = joined["index_right"].to_numpy()
+    return codes
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {elapsed:8.3f}s")
+    return result, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--processes", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--cell-deg", type=float, default=0.002)
+    args = parser.parse_args(argv)
+
+    shapes = synthetic_shapes()
+    lon, lat = synthetic_points(args.rows)
+    print(f"{args.rows:,} points, {len(shapes)} shapes")
+
+    expected, sjoin_s = timed("gpd.sjoin", lambda: sjoin_codes(shapes, lon, lat))
+    index, build_s = timed("NTAIndex build", lambda: NTAIndex(shapes, cell_deg=args.cell_deg))
+    print(f"  border cells: {index.border_fraction:.1%}")
+    codes, assign_s = timed("NTAIndex.assign", lambda: index.assign(lon, lat))
+    parallel, parallel_s = timed(
+        f"assign_parallel x{args.processes}",
+        lambda: index.assign_parallel(lon, lat, processes=args.processes),
+    )
+
+    mismatches = int(np.count_nonzero(codes != expected))
+    assert np.array_equal(codes, parallel), "parallel result differs from serial"
+    print(f"  mismatches vs sjoin: {mismatches} (points on a shared border may pick either side)")
+    print(f"  speedup: {sjoin_s / assign_s:.1f}x serial, {sjoin_s / (build_s + assign_s):.1f}x including build")
+
+
+if __name__ == "__main__":
+    main()
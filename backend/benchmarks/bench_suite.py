@@ -0,0 +1,227 @@
+"""
+Offline regression check: every load stage, the heatmap build and the per round hot path,
+timed and memory profiled on synthetic data and compared against stored baselines.
+
+    python backend/benchmarks/bench_suite.py --size 1m
+    python backend/benchmarks/bench_suite.py --size 50k 1m --save-baseline
+
+Data comes from synthetic_data.py (generated once per size into the temp dir). Stages run
+the same functions load_fresh_dataset / derive_map_data / the socket handlers call, in the
+same order, without importing main (which would start a load job). Each stage's time is the best of
+--repeat samples (hot path samples are --number calls, reported per call). peak MB comes from
+one more call under tracemalloc, the high water mark above the stage's start, numpy and Python
+allocations only (Arrow's pool isn't traced, bench_memory.py covers whole process RSS).
+
+Baselines live in baselines/<size>.json. A stage counts as a regression when it is more than
+--time-tolerance times slower or --memory-tolerance times bigger than its baseline, and the
+run then exits 1. The time tolerance is loose because timings swing on shared
+or single core machines while the traced peaks repeat exactly. Timings only compare on
+similar hardware, re-save baselines after moving machines or after a deliberate trade off.
+"""
+import argparse
+import gc
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import geopandas as gpd
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+from synthetic_data import SIZES, cached_dataset, parse_size  # noqa: E402
+from crime_categories import MAP_CATEGORIES, add_category_bits  # noqa: E402
+from crime_cube import CrimeCube  # noqa: E402
+from data_loader import read_crime_parquet, resident_frame  # noqa: E402
+from http_cache import CompressedBody  # noqa: E402
+from location_sampler import LocationSampler  # noqa: E402
+from map_data import nta_category_counts  # noqa: E402
+from map_render import render_choropleth  # noqa: E402
+from nta_join import row_nta_codes  # noqa: E402
+from scoring import score_round  # noqa: E402
+from zip_index import build_zip_crime_index  # noqa: E402
+
+PLAYERS = 8
+
+
+class Run:
+    """seconds and peak traced bytes per stage, in the order they ran"""
+
+    def __init__(self, repeat, number):
+        self.repeat = repeat
+        self.number = number
+        self.stages = {}
+
+    def stage(self, name, fn, hot=False):
+        """
+        One traced call of fn for its peak, then like timeit.repeat: repeat samples of number
+        calls each (1 unless hot), best sample per call is the time. Returns the traced call's result.
+        """
+        gc.collect()
+        tracemalloc.start()
+        start_bytes, _ = tracemalloc.get_traced_memory()
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # timed untraced, tracemalloc's per allocation hook would dominate microsecond calls.
+        # the best sample is the one least disturbed by everything else on the machine
+        number = self.number if hot else 1
+        samples = []
+        for _ in range(self.repeat):
+            gc.collect()
+            started = time.perf_counter()
+            for _ in range(number):
+                fn()
+            samples.append((time.perf_counter() - started) / number)
+        self.stages[name] = {"seconds": min(samples), "peak_bytes": max(peak - start_bytes, 0)}
+        return result
+
+
+def run_suite(parquet_path, geojson_path, repeat, number):
+    run = Run(repeat, number)
+
+    # load stages, as load_fresh_dataset and derive_map_data run them
+    df = run.stage("parquet_decode", lambda: read_crime_parquet(parquet_path))
+    shapes = run.stage("geojson_parse", lambda: gpd.read_file(geojson_path))
+    run.stage("classify", lambda: add_category_bits(df))
+    zip_index = run.stage("zip_index", lambda: build_zip_crime_index(df))
+    df["NTA_CODE"] = run.stage("nta_join", lambda: row_nta_codes(df, shapes))
+    nta_ids = shapes["NTA2020"].to_numpy()
+    boroughs = shapes["BoroName"].to_numpy()
+    nta_counts = run.stage(
+        "category_counts", lambda: nta_category_counts(df["NTA_CODE"], df["CRIME_BITS"], nta_ids, MAP_CATEGORIES)
+    )
+    cube = run.stage("crime_cube", lambda: CrimeCube.build(df, nta_ids, boroughs, MAP_CATEGORIES))
+    df = run.stage("resident_frame", lambda: resident_frame(df))
+    sampler = run.stage("location_sampler", lambda: LocationSampler.build(df, boroughs, zip_index))
+
+    # heatmap build, one category end to end the way MapRenderer renders a cache miss
+    html = run.stage("heatmap_render", lambda: render_choropleth(shapes, nta_counts["ASSAULT"], "ASSAULT"))
+    run.stage("heatmap_compress", lambda: CompressedBody(html))
+    filters = [
+        cube.parse_filters({"start": "2023-01", "end": "2023-12", "hours": "18-23", "borough": borough})
+        for borough in sorted(set(boroughs))
+    ]
+    calls = itertools.count()
+
+    def filtered_counts():
+        # _query skips the LRU, a filtered map cache miss pays this before rendering
+        i = next(calls)
+        return cube._query(MAP_CATEGORIES[i % len(MAP_CATEGORIES)], filters[i % len(filters)])
+
+    run.stage("cube_query", filtered_counts, hot=True)
+
+    # per round hot path: pick a location (its ZIP chart is formatted at build time, a list
+    # index here), score every player's guess
+    run.stage("random_location", lambda: sampler.sample(round_no=next(calls)), hot=True)
+    rng = np.random.default_rng(0)
+    actual = {"latitude": 40.7, "longitude": -73.9}
+    guesses = [{"latitude": float(lat), "longitude": float(lon)}
+               for lat, lon in zip(rng.uniform(40.5, 40.9, PLAYERS), rng.uniform(-74.2, -73.7, PLAYERS))]
+    run.stage("score_round", lambda: score_round(actual, guesses), hot=True)
+    return run, len(df)
+
+
+def baseline_path(size):
+    return os.path.join(BASELINE_DIR, f"{size}.json")
+
+
+def load_baseline(size):
+    path = baseline_path(size)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(size, rows, run):
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    payload = {
+        "rows": rows,
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} cpus",
+        "python": platform.python_version(),
+        "stages": {
+            name: {"seconds": round(r["seconds"], 7), "peak_bytes": r["peak_bytes"]}
+            for name, r in run.stages.items()
+        },
+    }
+    with open(baseline_path(size), "w") as f:
+        json.dump(payload, f, indent=2)
+        f.write("\n")
+
+
+def compare(run, baseline, time_tolerance, memory_tolerance, min_peak_bytes=1_000_000):
+    """print the stage table, return the names of stages that regressed"""
+    stages = (baseline or {}).get("stages", {})
+    regressed = []
+    print(f"  {'stage':<18} {'ms':>10} {'base ms':>10} {'x':>6} {'peak MB':>9} {'base MB':>9} {'x':>6}")
+    for name, r in run.stages.items():
+        base = stages.get(name)
+        line = f"  {name:<18} {r['seconds'] * 1000:>10.3f}"
+        if base is None:
+            print(f"{line} {'-':>10} {'':>6} {r['peak_bytes'] / 1e6:>9.1f} {'-':>9}")
+            continue
+        time_ratio = r["seconds"] / max(base["seconds"], 1e-9)
+        memory_ratio = r["peak_bytes"] / max(base["peak_bytes"], 1)
+        flags = []
+        if time_ratio > time_tolerance:
+            flags.append("SLOWER")
+        # small allocations swing with interpreter and library details, only flag real growth
+        if memory_ratio > memory_tolerance and r["peak_bytes"] - base["peak_bytes"] > min_peak_bytes:
+            flags.append("BIGGER")
+        if flags:
+            regressed.append(name)
+        print(
+            f"{line} {base['seconds'] * 1000:>10.3f} {time_ratio:>6.2f}"
+            f" {r['peak_bytes'] / 1e6:>9.1f} {base['peak_bytes'] / 1e6:>9.1f} {memory_ratio:>6.2f}"
+            f" {' '.join(flags)}"
+        )
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", nargs="+", default=["50k"], help=f"{', '.join(SIZES)} or row counts")
+    parser.add_argument("--repeat", type=int, default=5, help="timing samples per stage")
+    parser.add_argument("--number", type=int, default=500, help="calls per sample for hot path stages")
+    parser.add_argument("--time-tolerance", type=float, default=2.0)
+    parser.add_argument("--memory-tolerance", type=float, default=1.25)
+    parser.add_argument("--save-baseline", action="store_true", help="overwrite the baselines with this run")
+    args = parser.parse_args(argv)
+
+    failed = {}
+    for size in args.size:
+        rows = parse_size(size)
+        started = time.perf_counter()
+        parquet_path, geojson_path = cached_dataset(rows)
+        print(f"{size}: {rows:,} rows (data ready in {time.perf_counter() - started:.1f}s)")
+
+        run, resident_rows = run_suite(parquet_path, geojson_path, args.repeat, args.number)
+        if args.save_baseline:
+            compare(run, None, args.time_tolerance, args.memory_tolerance)
+            save_baseline(size, resident_rows, run)
+            print(f"  saved {os.path.relpath(baseline_path(size))}")
+            continue
+
+        baseline = load_baseline(size)
+        if baseline is None:
+            print(f"  no baseline for {size}, run with --save-baseline to record one")
+        regressed = compare(run, baseline, args.time_tolerance, args.memory_tolerance)
+        if regressed:
+            failed[size] = regressed
+
+    if failed:
+        for size, names in failed.items():
+            print(f"regressed at {size}: {', '.join(names)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+"""
+Headless load test for the geoguesser socket handlers: N rooms playing full matches at once.
+
+    python backend/benchmarks/load_test.py --rooms 50 --players 4
+    python backend/benchmarks/load_test.py --url http://localhost:8080 --rooms 200 --ramp 10
+
+Without --url a server is started the way the Dockerfile runs it (gunicorn, one gevent
+worker, --worker-connections as given) on synthetic data from synthetic_data.py. Every room
+connects its players, creates / joins, plays --games full matches (start_game, a guess per
+player per round after up to --think seconds, ready_for_next_round) and disconnects.
+
+Reported per event, client side:
+    acks        create_room, join_room, ... emitted with an ack, time until the handler returned
+    broadcasts  round_start / round_end / game_end, time from the emit that caused them until
+                each player got it (round_end from the room's last guess)
+next to the server's own handler p99 from /metrics. Client p99 far above the server's means
+handlers wait on the loop rather than doing work. The server's event loop lag
+(camp_event_loop_lag_seconds) and resident memory are scraped from /metrics during the run.
+A blocking call shows up as loop lag and as slow acks on every event at once.
+
+Every open connection counts against Cloud Run's --concurrency, so the peak connection count
+divided by it is the instance count the run needed. Clients are greenlets in this one
+process, on a single core they compete with the server for CPU, so keep an eye on the
+"client cpu" line. Clients stay on long polling unless websocket-client is installed
+(pip install websocket-client), which is what browsers upgrade to.
+"""
+from gevent import monkey
+
+monkey.patch_all()
+
+import argparse  # noqa: E402
+import math  # noqa: E402
+import os  # noqa: E402
+import random  # noqa: E402
+import re  # noqa: E402
+import resource  # noqa: E402
+import signal  # noqa: E402
+import socket  # noqa: E402
+import subprocess  # noqa: E402
+import sys  # noqa: E402
+import tempfile  # noqa: E402
+import time  # noqa: E402
+from collections import Counter, defaultdict  # noqa: E402
+
+import gevent  # noqa: E402
+import numpy as np  # noqa: E402
+import requests  # noqa: E402
+import socketio  # noqa: E402
+from gevent.queue import Empty, Queue  # noqa: E402
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+from synthetic_data import cached_dataset, parse_size  # noqa: E402
+
+ACK_EVENTS = ["connect", "create_room", "join_room", "start_game", "submit_guess", "ready_for_next_round"]
+BROADCAST_EVENTS = ["round_start", "round_end", "game_end"]
+# a guess lands somewhere in the city
+GUESS_BOUNDS = (40.55, 40.88, -74.15, -73.75)
+_SAMPLE = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+class RoomFailed(Exception):
+    pass
+
+
+class Recorder:
+    """latencies per event, errors and the open connection count, shared by every client"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.open = 0
+        self.peak_open = 0
+
+    def observe(self, event, seconds):
+        self.latencies[event].append(seconds)
+
+    def opened(self):
+        self.open += 1
+        self.peak_open = max(self.peak_open, self.open)
+
+    def closed(self):
+        self.open -= 1
+
+
+class Client:
+    """one player's socket, every event it receives lands in a queue per event name"""
+
+    def __init__(self, url, recorder, timeout, transports):
+        self.url = url
+        self.recorder = recorder
+        self.timeout = timeout
+        self.transports = transports
+        self.sio = socketio.Client(reconnection=False)
+        self.inbox = defaultdict(Queue)
+        self.sio.on("*", self._received)
+
+    def _received(self, event, data=None):
+        if event == "error":
+            self.recorder.errors[(data or {}).get("message", "error")] += 1
+        self.inbox[event].put((time.perf_counter(), data))
+
+    def connect(self):
+        start = time.perf_counter()
+        self.sio.connect(self.url, transports=self.transports, wait_timeout=self.timeout)
+        self.recorder.opened()
+        # the server answers every connect with "connected"
+        self.expect("connected")
+        self.recorder.observe("connect", time.perf_counter() - start)
+
+    def call(self, event, data):
+        """emit with an ack and time it, returns when the handler has returned"""
+        start = time.perf_counter()
+        self.sio.call(event, data, timeout=self.timeout)
+        self.recorder.observe(event, time.perf_counter() - start)
+        return start
+
+    def send(self, event, data):
+        """emit without waiting, for events whose answer is a broadcast, returns the send time"""
+        start = time.perf_counter()
+        self.sio.emit(event, data, callback=lambda *_: self.recorder.observe(event, time.perf_counter() - start))
+        return start
+
+    def expect(self, event):
+        """(receive time, data) of the next event of that name"""
+        try:
+            return self.inbox[event].get(timeout=self.timeout)
+        except Empty:
+            raise RoomFailed(f"no {event} within {self.timeout}s") from None
+
+    def close(self):
+        if self.sio.connected:
+            self.sio.disconnect()
+            self.recorder.closed()
+
+
+def play_room(index, args, recorder, finished):
+    """one room from connect to disconnect, args.games matches long"""
+    rng = random.Random(index)
+    clients = [Client(args.url, recorder, args.timeout, args.transports) for _ in range(args.players)]
+    host, guests = clients[0], clients[1:]
+    try:
+        for client in clients:
+            client.connect()
+        host.call("create_room", {"player_name": f"host{index}", "max_players": args.players})
+        _, created = host.expect("room_created")
+        code = created["room_code"]
+        for i, guest in enumerate(guests):
+            guest.call("join_room", {"room_code": code, "player_name": f"p{index}-{i}"})
+            guest.expect("room_joined")
+
+        for _ in range(args.games):
+            sent = host.send("start_game", {"room_code": code})
+            while True:
+                # the host's emit causes the round_start (or game_end after the last round)
+                arrivals = [client_next_round(client) for client in clients]
+                if arrivals[0][0] == "game_end":
+                    for _, at in arrivals:
+                        recorder.observe("game_end", at - sent)
+                    break
+                for _, at in arrivals:
+                    recorder.observe("round_start", at - sent)
+
+                guessed = [gevent.spawn(guess, client, code, rng.uniform(0, args.think), rng) for client in clients]
+                gevent.joinall(guessed, raise_error=True)
+                last_guess = max(g.value for g in guessed)
+                for client in clients:
+                    at, _ = client.expect("round_end")
+                    recorder.observe("round_end", at - last_guess)
+
+                gevent.sleep(rng.uniform(0, args.think))
+                sent = host.send("ready_for_next_round", {"room_code": code})
+        finished.append(index)
+    except (RoomFailed, socketio.exceptions.SocketIOError, OSError) as e:
+        recorder.errors[f"room failed: {e}"] += 1
+    finally:
+        for client in clients:
+            try:
+                client.close()
+            except Exception:
+                pass
+
+
+def client_next_round(client):
+    """whichever of round_start / game_end comes next, as (event, receive time)"""
+    deadline = time.perf_counter() + client.timeout
+    while time.perf_counter() < deadline:
+        for event in ("round_start", "game_end"):
+            try:
+                at, _ = client.inbox[event].get_nowait()
+                return event, at
+            except Empty:
+                pass
+        gevent.sleep(0.001)
+    raise RoomFailed(f"no round_start or game_end within {client.timeout}s")
+
+
+def guess(client, code, think, rng):
+    gevent.sleep(think)
+    lat_lo, lat_hi, lon_lo, lon_hi = GUESS_BOUNDS
+    return client.send("submit_guess", {
+        "room_code": code, "latitude": rng.uniform(lat_lo, lat_hi), "longitude": rng.uniform(lon_lo, lon_hi),
+    })
+
+
+def parse_metrics(text):
+    """Prometheus text into {(name, ((label, value), ...)): float}"""
+    samples = {}
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if match:
+            name, labels, value = match.groups()
+            samples[(name, tuple(sorted(_LABEL.findall(labels or ""))))] = float(value)
+    return samples
+
+
+def histogram_delta(before, after, name, **labels):
+    """cumulative (upper bound, count) pairs of one histogram series observed between two scrapes"""
+    buckets = []
+    for (sample, sample_labels), value in after.items():
+        sample_labels_dict = dict(sample_labels)
+        le = sample_labels_dict.pop("le", None)
+        if sample == f"{name}_bucket" and sample_labels_dict == labels:
+            buckets.append((float(le), value - before.get((sample, sample_labels), 0.0)))
+    return sorted(buckets)
+
+
+def histogram_quantile(q, buckets):
+    """Prometheus histogram_quantile: linear within the bucket the rank falls in"""
+    if not buckets or buckets[-1][1] <= 0:
+        return None
+    rank = q * buckets[-1][1]
+    lower, below = 0.0, 0.0
+    for upper, count in buckets:
+        if count >= rank:
+            if math.isinf(upper):
+                return lower
+            return lower + (upper - lower) * (rank - below) / max(count - below, 1e-12)
+        lower, below = upper, count
+    return lower
+
+
+def scrape(base_url):
+    return parse_metrics(requests.get(f"{base_url}/metrics", timeout=10).text)
+
+
+def websocket_client_available():
+    try:
+        import websocket  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args):
+    """gunicorn on synthetic data, returns (process, url, log path) once the dataset is live"""
+    parquet_path, geojson_path = cached_dataset(parse_size(args.size))
+    tmp = tempfile.mkdtemp(prefix="camp-load-")
+    port = free_port()
+    env = dict(
+        os.environ,
+        LOCAL_PARQUET_PATH=parquet_path,
+        LOCAL_GEOJSON_PATH=geojson_path,
+        SNAPSHOT_DIR=os.path.join(tmp, "snapshots"),
+    )
+    log_path = os.path.join(tmp, "server.log")
+    command = [
+        sys.executable, "-m", "gunicorn", "-b", f"127.0.0.1:{port}",
+        "--worker-class", "gevent", "--worker-connections", str(args.worker_connections),
+        "--timeout", "120", "--workers", "1", "main:app",
+    ]
+    with open(log_path, "w") as log:
+        process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + args.startup_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"server exited with {process.returncode}, see {log_path}")
+        try:
+            if ("camp_dataset_rows", ()) in scrape(url):
+                return process, url, log_path
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise SystemExit(f"server didn't load its data within {args.startup_timeout}s, see {log_path}")
+
+
+def watch_memory(url, samples, interval=1.0):
+    while True:
+        try:
+            samples.append(scrape(url).get(("camp_process_resident_bytes", ())))
+        except requests.RequestException:
+            pass
+        gevent.sleep(interval)
+
+
+def report(args, recorder, finished, elapsed, before, after, rss_samples):
+    total = args.rooms * args.games
+    print(f"{args.rooms} rooms x {args.players} players, {len(finished) * args.games}/{total} matches "
+          f"finished in {elapsed:.1f}s, peak {recorder.peak_open} open connections")
+
+    print(f"{'event':<22} {'count':>7} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'server p99':>11}")
+    for event in ACK_EVENTS + BROADCAST_EVENTS:
+        values = np.array(recorder.latencies.get(event, [])) * 1000
+        if not len(values):
+            continue
+        server = histogram_quantile(0.99, histogram_delta(before, after, "camp_socket_handler_seconds", event=event))
+        server = f"{server * 1000:>11.2f}" if server is not None else f"{'-':>11}"
+        kind = "" if event in ACK_EVENTS else " *"
+        print(f"{event + kind:<22} {len(values):>7} {np.percentile(values, 50):>9.2f} "
+              f"{np.percentile(values, 99):>9.2f} {values.max():>9.2f} {server}")
+    print("  * broadcast, from the emit that caused it to each player")
+
+    lag = histogram_delta(before, after, "camp_event_loop_lag_seconds")
+    if lag and lag[-1][1] > 0:
+        worst = next(upper for upper, count in lag if count >= lag[-1][1])
+        print(f"loop lag: p50 {histogram_quantile(0.5, lag) * 1000:.2f} ms, "
+              f"p99 {histogram_quantile(0.99, lag) * 1000:.2f} ms, max <= {worst * 1000:g} ms "
+              f"over {int(lag[-1][1])} wakeups")
+
+    start_rss = before.get(("camp_process_resident_bytes", ()))
+    end_rss = after.get(("camp_process_resident_bytes", ()))
+    rss = [r for r in rss_samples if r is not None]
+    if start_rss and end_rss:
+        peak = max(rss + [end_rss])
+        print(f"server rss: {start_rss / 1e6:.1f} MB before, {peak / 1e6:.1f} MB peak, "
+              f"{end_rss / 1e6:.1f} MB after ({(end_rss - start_rss) / 1e6:+.1f} MB)")
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    print(f"client cpu: {usage.ru_utime + usage.ru_stime:.1f}s over {elapsed:.1f}s")
+    for message, count in recorder.errors.most_common(10):
+        print(f"error x{count}: {message}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="server to test, default starts one on synthetic data")
+    parser.add_argument("--rooms", type=int, default=20)
+    parser.add_argument("--players", type=int, default=2, help="players per room")
+    parser.add_argument("--games", type=int, default=1, help="matches per room")
+    parser.add_argument("--think", type=float, default=1.0, help="max seconds before a guess / next round")
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds over which rooms start")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait on any reply")
+    parser.add_argument("--size", default="50k", help="synthetic dataset for a started server")
+    parser.add_argument("--worker-connections", type=int, default=1000)
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--transport", choices=["auto", "polling", "websocket"], default="auto")
+    args = parser.parse_args(argv)
+    if args.transport == "auto":
+        # upgrade to websockets like a browser would when the client library can
+        args.transports = ["polling", "websocket"] if websocket_client_available() else ["polling"]
+    else:
+        args.transports = [args.transport]
+
+    process = None
+    if args.url is None:
+        process, args.url, log_path = start_server(args)
+        print(f"server on {args.url}, log in {log_path}")
+    try:
+        before = scrape(args.url)
+        rss_samples = []
+        watcher = gevent.spawn(watch_memory, args.url, rss_samples)
+
+        recorder = Recorder()
+        finished = []
+        start = time.perf_counter()
+        rooms = [
+            gevent.spawn_later(args.ramp * i / max(args.rooms, 1), play_room, i, args, recorder, finished)
+            for i in range(args.rooms)
+        ]
+        gevent.joinall(rooms)
+        elapsed = time.perf_counter() - start
+
+        watcher.kill()
+        # the disconnects are handled after the clients stop waiting
+        gevent.sleep(1)
+        after = scrape(args.url)
+        report(args, recorder, finished, elapsed, before, after, rss_samples)
+    finally:
+        if process is not None:
+            # SIGINT is gunicorn's quick shutdown, TERM would wait out every open connection
+            process.send_signal(signal.SIGINT)
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    if len(finished) < args.rooms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
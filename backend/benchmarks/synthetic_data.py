@@ -0,0 +1,187 @@
+"""
+Synthetic NYC shaped crime rows and a toy NTA GeoJSON, so the load, heatmap and round code
+can be exercised without the GCS parquet.
+
+    python backend/benchmarks/synthetic_data.py --size 1m --out /tmp/camp-synth
+
+Writes crime.parquet with the columns the 911 CSV chunks have (Latitude, Longitude, ZIPCODE,
+TYP_DESC, INCIDENT_DATE, INCIDENT_TIME, plain strings like a fresh CSV merge) and
+nyc_nta_2020.geojson (NTA2020, NTAName, BoroName). Run the server on them with
+LOCAL_PARQUET_PATH=<out>/crime.parquet LOCAL_GEOJSON_PATH=<out>/nyc_nta_2020.geojson.
+
+Shapes are Voronoi cells over the NYC bounding box, each given the borough whose center is
+nearest. Rows cluster around a few hotspots per NTA with lognormal NTA weights, so counts are
+skewed the way the real ones are. ZIP codes come from the NTA's borough range, descriptions
+are about a hundred distinct 911 style strings, dates span 2022-2024 and hours follow a
+day/night curve. The same rows, ntas and seed always give the same files.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shapely
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_nta_join import NYC_BOUNDS, synthetic_shapes  # noqa: E402
+
+SIZES = {"50k": 50_000, "1m": 1_000_000, "5m": 5_000_000}
+
+BOROUGHS = {
+    # center (lon, lat), ZIP range
+    "Manhattan": ((-73.97, 40.78), (10001, 10282)),
+    "Bronx": ((-73.87, 40.85), (10451, 10475)),
+    "Brooklyn": ((-73.95, 40.65), (11201, 11256)),
+    "Queens": ((-73.80, 40.72), (11354, 11436)),
+    "Staten Island": ((-74.15, 40.58), (10301, 10314)),
+}
+
+# share of 911 calls per description, non crime calls included since the real feed has them
+DESCRIPTIONS = {
+    "DISPUTE": 0.12, "NOISE": 0.10, "HARASSMENT": 0.10, "ASSAULT": 0.08, "LARCENY": 0.09,
+    "INVESTIGATE/POSSIBLE CRIME": 0.07, "VEHICLE ACCIDENT": 0.06, "ALARMS": 0.06,
+    "CRIM MISCHIEF": 0.05, "DOMESTIC": 0.05, "EMS ASSIST": 0.04, "TRESPASS": 0.03,
+    "NARCOTICS": 0.03, "BURGLARY": 0.03, "ROBBERY": 0.03, "LARCENY/VEHICLE": 0.02,
+    "SHOTS FIRED": 0.015, "SHOT SPOTTER": 0.01, "MARIJUANA": 0.01, "VIOL ORDER PROTECT": 0.01,
+    "GRAFFITI": 0.005, "FIREARM DISPLAYED": 0.005,
+}
+SUFFIXES = {"": 0.4, " (IN PROGRESS)": 0.2, ": INSIDE": 0.15, ": OUTSIDE": 0.15, ": PAST": 0.1}
+
+# relative call volume per hour of day, quiet before dawn and busiest in the evening
+HOUR_WEIGHTS = np.array([
+    5, 4, 3, 2, 2, 2, 3, 4, 5, 5, 6, 6, 6, 6, 7, 7, 8, 8, 8, 8, 8, 7, 7, 6,
+], dtype=np.float64)
+FIRST_DAY = "2022-01-01"
+DAYS = 3 * 365
+HOTSPOTS_PER_NTA = 8
+# ~300m of spread around a hotspot
+HOTSPOT_SPREAD_DEG = 0.003
+SCATTERED_SHARE = 0.01
+NULL_ZIP_SHARE = 0.01
+
+
+def toy_nta_shapes(n_ntas=260, seed=0):
+    """synthetic_shapes plus the NTAName / BoroName columns the real geojson carries"""
+    shapes = synthetic_shapes(n_ntas, seed)
+    centroids = shapely.centroid(shapes.geometry.values)
+    centers = np.array([center for center, _ in BOROUGHS.values()])
+    xy = np.column_stack([shapely.get_x(centroids), shapely.get_y(centroids)])
+    nearest = np.argmin(((xy[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2), axis=1)
+    boroughs = np.array(list(BOROUGHS), dtype=object)[nearest]
+    shapes["BoroName"] = boroughs
+    shapes["NTAName"] = [f"{boro} {code}" for boro, code in zip(boroughs, shapes["NTA2020"])]
+    return shapes
+
+
+def _points_in(geometry, n, rng):
+    """n uniform points inside one polygon by rejection from its bounds"""
+    min_x, min_y, max_x, max_y = geometry.bounds
+    found = np.empty((0, 2))
+    while len(found) < n:
+        xy = np.column_stack([rng.uniform(min_x, max_x, 4 * n), rng.uniform(min_y, max_y, 4 * n)])
+        found = np.vstack([found, xy[shapely.contains_xy(geometry, xy[:, 0], xy[:, 1])]])
+    return found[:n]
+
+
+def _strings(codes, values):
+    """plain string column from codes into values, null where codes is -1"""
+    indices = pa.array(codes, mask=codes < 0, type=pa.int32())
+    return pa.DictionaryArray.from_arrays(indices, pa.array(values, type=pa.string())).dictionary_decode()
+
+
+def synthetic_crimes(rows, shapes, seed=1):
+    """pyarrow Table of raw crime rows laid over shapes (from toy_nta_shapes)"""
+    rng = np.random.default_rng(seed)
+    n_ntas = len(shapes)
+
+    # a few hotspots inside every NTA, busy NTAs get many more rows than quiet ones
+    hotspots = np.stack([_points_in(geometry, HOTSPOTS_PER_NTA, rng) for geometry in shapes.geometry.values])
+    weights = rng.lognormal(0.0, 1.0, n_ntas)
+    nta = rng.choice(n_ntas, rows, p=weights / weights.sum())
+    spot = hotspots[nta, rng.integers(0, HOTSPOTS_PER_NTA, rows)]
+    lon = spot[:, 0] + rng.normal(0.0, HOTSPOT_SPREAD_DEG, rows)
+    lat = spot[:, 1] + rng.normal(0.0, HOTSPOT_SPREAD_DEG, rows)
+
+    # some calls geocode to water, the edge of the city or past it
+    scattered = rng.random(rows) < SCATTERED_SHARE
+    min_x, min_y, max_x, max_y = NYC_BOUNDS
+    lon[scattered] = rng.uniform(min_x - 0.05, max_x + 0.05, scattered.sum())
+    lat[scattered] = rng.uniform(min_y - 0.05, max_y + 0.05, scattered.sum())
+
+    # two ZIP codes per NTA out of its borough's range
+    zip_ranges = np.array([BOROUGHS[boro][1] for boro in shapes["BoroName"]])
+    nta_zips = rng.integers(zip_ranges[:, :1], zip_ranges[:, 1:] + 1, (n_ntas, 2))
+    zip_values, zip_codes = np.unique(nta_zips[nta, rng.integers(0, 2, rows)], return_inverse=True)
+    zip_codes = zip_codes.astype(np.int32)
+    zip_codes[rng.random(rows) < NULL_ZIP_SHARE] = -1
+
+    descriptions = [base + suffix for base in DESCRIPTIONS for suffix in SUFFIXES]
+    description_p = np.outer(list(DESCRIPTIONS.values()), list(SUFFIXES.values())).ravel()
+    description_codes = rng.choice(len(descriptions), rows, p=description_p / description_p.sum())
+
+    dates = pd.date_range(FIRST_DAY, periods=DAYS, freq="D").strftime("%m/%d/%Y").to_numpy()
+    minutes = [f"{h:02d}:{m:02d}:00" for h in range(24) for m in range(60)]
+    hour = rng.choice(24, rows, p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum())
+
+    return pa.table({
+        "Latitude": lat,
+        "Longitude": lon,
+        "ZIPCODE": _strings(zip_codes, zip_values.astype(str)),
+        "TYP_DESC": _strings(description_codes, descriptions),
+        "INCIDENT_DATE": _strings(rng.integers(0, DAYS, rows), dates),
+        "INCIDENT_TIME": _strings(hour * 60 + rng.integers(0, 60, rows), minutes),
+    })
+
+
+def write_dataset(out_dir, rows, n_ntas=260, seed=1):
+    """crime.parquet and nyc_nta_2020.geojson in out_dir, returns both paths"""
+    os.makedirs(out_dir, exist_ok=True)
+    parquet_path = os.path.join(out_dir, "crime.parquet")
+    geojson_path = os.path.join(out_dir, "nyc_nta_2020.geojson")
+    shapes = toy_nta_shapes(n_ntas)
+    shapes.to_file(geojson_path, driver="GeoJSON")
+    pq.write_table(synthetic_crimes(rows, shapes, seed), parquet_path)
+    return parquet_path, geojson_path
+
+
+def cached_dataset(rows, n_ntas=260, seed=1, root=None):
+    """write_dataset into a per (rows, ntas, seed) temp directory once, reuse it after that"""
+    root = root or os.path.join(tempfile.gettempdir(), "camp-bench")
+    out_dir = os.path.join(root, f"{rows}-{n_ntas}-{seed}")
+    parquet_path = os.path.join(out_dir, "crime.parquet")
+    geojson_path = os.path.join(out_dir, "nyc_nta_2020.geojson")
+    if not (os.path.exists(parquet_path) and os.path.exists(geojson_path)):
+        write_dataset(out_dir, rows, n_ntas, seed)
+    return parquet_path, geojson_path
+
+
+def parse_size(value):
+    """50k / 1m / 5m or a plain row count"""
+    if value.lower() in SIZES:
+        return SIZES[value.lower()]
+    return int(value.replace("_", ""))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", default="1m", help=f"{', '.join(SIZES)} or a row count")
+    parser.add_argument("--ntas", type=int, default=260)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args(argv)
+
+    rows = parse_size(args.size)
+    start = time.perf_counter()
+    parquet_path, geojson_path = write_dataset(args.out, rows, args.ntas, args.seed)
+    print(f"{rows:,} rows in {time.perf_counter() - start:.1f}s")
+    print(f"  {parquet_path} ({os.path.getsize(parquet_path) / 1e6:.1f} MB)")
+    print(f"  {geojson_path} ({os.path.getsize(geojson_path) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
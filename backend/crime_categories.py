@@ -0,0 +1,122 @@
+#one place that decides which crime category a TYP_DESC belongs to
+#regex only runs over the few hundred distinct descriptions, rows just look up a bitmask
+import numpy as np
+import pandas as pd
+
+# include = any keyword matches, require = every keyword must match, exclude = none may match
+CATEGORY_RULES = {
+    "VANDALISM": {
+        "include": ["CRIM MISCHIEF", "TRESPASS", "GRAFF"],
+        "exclude": ["ASSAULT", "HARASSMENT"]
+    },
+    "DRUGS": {
+        "include": ["NARCO", "MARIJUANA"],
+        "exclude": []
+    },
+    "HARASSMENT": {
+        "include": ["HARASSMENT", "VIOL ORDER PROTECT", "DOMESTIC", "FAMILY"],
+        "exclude": ["ASSAULT"]
+    },
+    "ASSAULT": {
+        "include": ["ASSAULT"],
+        "exclude": []
+    },
+    "VEHICLE THEFT": {
+        "include": ["LARCENY", "VEHICLE"],
+        "exclude": []
+    },
+    "THEFT": {
+        "include": ["LARCENY"],
+        "exclude": ["VEHICLE"]
+    },
+    "BURGLARY": {
+        "include": ["BURGLARY"],
+        "exclude": []
+    },
+    "ROBBERY": {
+        "include": ["ROBBERY"],
+        "exclude": []
+    },
+    "SHOOTINGS": {
+        "include": ["SHOT SPOTTER", "SHOTS", "FIREARM"],
+        "exclude": []
+    },
+    # the geoguesser chart counts only larcenies that mention a vehicle, the map counts either word
+    "VEHICLE LARCENY": {
+        "include": ["LARCENY"],
+        "require": ["VEHICLE"],
+        "exclude": []
+    },
+}
+
+# categories that get a heatmap
+MAP_CATEGORIES = [
+    "VANDALISM", "DRUGS", "HARASSMENT", "ASSAULT", "VEHICLE THEFT",
+    "THEFT", "BURGLARY", "ROBBERY", "SHOOTINGS",
+]
+
+# geoguesser bar chart label -> category, in the order the frontend shows them
+CHART_CATEGORIES = {
+    "Shooting": "SHOOTINGS",
+    "Robbery": "ROBBERY",
+    "Burglary": "BURGLARY",
+    "Theft (non vehicle)": "THEFT",
+    "Vehicle theft": "VEHICLE LARCENY",
+    "Assault": "ASSAULT",
+    "Harassment": "HARASSMENT",
+    "Drug": "DRUGS",
+    "Vandalism": "VANDALISM",
+}
+
+CATEGORY_BITS = {cat: 1 << i for i, cat in enumerate(CATEGORY_RULES)}
+BITS_DTYPE = np.uint16
+
+
+def classify_descriptions(descriptions):
+    """bitmask per description, this is the only place the keyword regexes run"""
+    desc = pd.Series(descriptions, dtype="object")
+    bits = np.zeros(len(desc), dtype=BITS_DTYPE)
+
+    for cat, rules in CATEGORY_RULES.items():
+        mask = desc.str.contains("|".join(rules["include"]), case=False, na=False)
+        for word in rules.get("require", []):
+            mask &= desc.str.contains(word, case=False, na=False)
+        if rules["exclude"]:
+            mask &= ~desc.str.contains("|".join(rules["exclude"]), case=False, na=False)
+        bits[mask.to_numpy()] |= CATEGORY_BITS[cat]
+
+    return bits
+
+
+def classify_rows(typ_desc):
+    """
+    Bitmask per row. The column is turned into a Categorical so the regex pass
+    sees each distinct description once and rows just index into the result.
+    """
+    desc = typ_desc if isinstance(typ_desc.dtype, pd.CategoricalDtype) else typ_desc.astype("category")
+    desc_bits = classify_descriptions(desc.cat.categories)
+    codes = desc.cat.codes.to_numpy()
+
+    # code -1 is a missing description, which never matches anything
+    row_bits = np.zeros(len(codes), dtype=BITS_DTYPE)
+    known = codes >= 0
+    row_bits[known] = desc_bits[codes[known]]
+    return row_bits
+
+
+def add_category_bits(df):
+    """Store TYP_DESC as a Categorical and add the CRIME_BITS column in place"""
+    if not isinstance(df["TYP_DESC"].dtype, pd.CategoricalDtype):
+        df["TYP_DESC"] = df["TYP_DESC"].astype("category")
+    df["CRIME_BITS"] = classify_rows(df["TYP_DESC"])
+    return df
+
+
+def category_mask(bits, category):
+    """bool array of the rows in a category, bits is the CRIME_BITS column or array"""
+    return (np.asarray(bits) & CATEGORY_BITS[category]) != 0
+
+
+def category_rows(bits, category):
+    """row positions of a category, a subset is passed around as this instead of a copied frame"""
+    return np.flatnonzero(category_mask(bits, category))
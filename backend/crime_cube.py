@@ -0,0 +1,201 @@
+#NTA x category x (month, hour of day) counts so date / hour / borough filtered maps are
+#a couple of numpy sums instead of another pass over millions of rows
+#months are the finest date step, a date range covers every month it touches
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from crime_categories import CATEGORY_BITS
+
+HOURS = 24
+# rows with no usable time land in these slots, only unfiltered queries count them
+UNKNOWN_HOUR = HOURS
+FILTER_PARAMS = ("start", "end", "hours", "borough")
+QUERY_CACHE_SIZE = 256
+
+
+def _row_months_and_hours(df):
+    """(month label per row or None, month index per row (-1 unknown), hour per row (UNKNOWN_HOUR unknown))"""
+    n = len(df)
+    month_idx = np.full(n, -1, dtype=np.int32)
+    hours = np.full(n, UNKNOWN_HOUR, dtype=np.int8)
+    months = []
+
+    if "INCIDENT_DATE" in df:
+        # parse each distinct date once, rows only carry category codes
+        dates = df["INCIDENT_DATE"]
+        if not isinstance(dates.dtype, pd.CategoricalDtype):
+            dates = dates.astype("category")
+        parsed = pd.to_datetime(pd.Series(dates.cat.categories), errors="coerce", format="mixed")
+        labels = parsed.dt.strftime("%Y-%m")
+        months = sorted(label for label in labels.dropna().unique())
+        lookup = labels.map({label: i for i, label in enumerate(months)}).fillna(-1).to_numpy(dtype=np.int32)
+        codes = dates.cat.codes.to_numpy()
+        known = codes >= 0
+        month_idx[known] = lookup[codes[known]]
+
+        if "INCIDENT_TIME" not in df:
+            # a full timestamp in INCIDENT_DATE still carries the hour
+            hour_lookup = parsed.dt.hour.fillna(UNKNOWN_HOUR).to_numpy(dtype=np.int8)
+            hours[known] = hour_lookup[codes[known]]
+
+    if "INCIDENT_TIME" in df:
+        times = df["INCIDENT_TIME"]
+        if not isinstance(times.dtype, pd.CategoricalDtype):
+            times = times.astype("category")
+        text = pd.Series(times.cat.categories).astype(str)
+        hour_lookup = pd.to_numeric(text.str.extract(r"^\s*(\d{1,2})", expand=False), errors="coerce")
+        hour_lookup = hour_lookup.where((hour_lookup >= 0) & (hour_lookup < HOURS)).fillna(UNKNOWN_HOUR)
+        hour_lookup = hour_lookup.to_numpy(dtype=np.int8)
+        codes = times.cat.codes.to_numpy()
+        known = codes >= 0
+        hours[known] = hour_lookup[codes[known]]
+
+    return months, month_idx, hours
+
+
+class CrimeCube:
+    """
+    counts has shape (months + 1, 25, NTAs, categories); the last month slot holds rows with
+    no date and hour slot 24 holds rows with no time. Month totals are kept as prefix sums
+    so any date range is one subtraction.
+    """
+
+    def __init__(self, counts, months, nta_ids, nta_boroughs, categories):
+        self.counts = np.asarray(counts, dtype=np.int32)
+        self.months = list(months)
+        self.nta_ids = pd.Index(nta_ids, name="NTA2020")
+        self.nta_boroughs = np.asarray(nta_boroughs, dtype=object)
+        self.categories = list(categories)
+        self.boroughs = sorted({b for b in self.nta_boroughs if isinstance(b, str) and b})
+
+        known = self.counts[:-1]
+        self._prefix = np.zeros((len(self.months) + 1,) + known.shape[1:], dtype=np.int32)
+        np.cumsum(known, axis=0, out=self._prefix[1:])
+        self._cached_query = lru_cache(maxsize=QUERY_CACHE_SIZE)(self._query)
+
+    @classmethod
+    def build(cls, df, nta_ids, nta_boroughs, categories):
+        """df needs NTA_CODE and CRIME_BITS, INCIDENT_DATE / INCIDENT_TIME are used when present"""
+        months, month_idx, hours = _row_months_and_hours(df)
+        n_months, n_nta = len(months), len(nta_ids)
+        month_idx = np.where(month_idx >= 0, month_idx, n_months)
+
+        nta_code = df["NTA_CODE"].to_numpy()
+        inside = nta_code >= 0
+        flat = (
+            (month_idx[inside].astype(np.int64) * (HOURS + 1) + hours[inside]) * n_nta
+            + nta_code[inside]
+        )
+        bits = df["CRIME_BITS"].to_numpy()[inside]
+
+        size = (n_months + 1) * (HOURS + 1) * n_nta
+        counts = np.zeros((size, len(categories)), dtype=np.int32)
+        for i, cat in enumerate(categories):
+            mask = (bits & CATEGORY_BITS[cat]) != 0
+            counts[:, i] = np.bincount(flat[mask], minlength=size)
+
+        return cls(
+            counts.reshape(n_months + 1, HOURS + 1, n_nta, len(categories)),
+            months, nta_ids, nta_boroughs, categories,
+        )
+
+    def merged(self, other):
+        """
+        New cube holding this cube's counts plus other's (same NTAs and categories), months are
+        the union of both. How appended rows get in without re-bucketing the old ones.
+        """
+        months = sorted(set(self.months) | set(other.months))
+        counts = np.zeros((len(months) + 1,) + self.counts.shape[1:], dtype=np.int32)
+        for cube in (self, other):
+            counts[np.searchsorted(months, cube.months)] += cube.counts[:-1]
+            counts[-1] += cube.counts[-1]
+        return CrimeCube(counts, months, self.nta_ids, self.nta_boroughs, self.categories)
+
+    def parse_filters(self, args):
+        """
+        Normalise request args into a hashable filter key, None when nothing is filtered.
+        start / end: YYYY-MM or YYYY-MM-DD, hours: "18-23", "22-3" (wraps midnight) or "8",
+        borough: any case. Raises ValueError with a message fit for a 400.
+        """
+        key = {}
+        for param in ("start", "end"):
+            value = (args.get(param) or "").strip()
+            if value:
+                parsed = pd.to_datetime(value, errors="coerce")
+                if pd.isna(parsed):
+                    raise ValueError(f"Invalid {param} date: {value}")
+                key[param] = parsed.strftime("%Y-%m")
+
+        hours = (args.get("hours") or "").strip()
+        if hours:
+            key["hours"] = _parse_hours(hours)
+
+        borough = (args.get("borough") or "").strip()
+        if borough:
+            match = [b for b in self.boroughs if b.lower() == borough.lower()]
+            if not match:
+                raise ValueError(f"Invalid borough: {borough}")
+            key["borough"] = match[0]
+
+        if ("start" in key or "end" in key or "hours" in key) and not self.months:
+            raise ValueError("This dataset has no incident dates, only borough filters are available")
+        return tuple(sorted(key.items())) or None
+
+    def query(self, category, filters=None):
+        """incident counts per NTA (Series indexed by NTA2020) for one category under a filter key"""
+        return self._cached_query(category, filters)
+
+    def _query(self, category, filters):
+        filters = dict(filters or ())
+        cat = self.categories.index(category)
+
+        if "start" in filters or "end" in filters:
+            lo = np.searchsorted(self.months, filters.get("start", ""), side="left")
+            hi = np.searchsorted(self.months, filters.get("end", "9999-12"), side="right")
+            hi = max(hi, lo)
+            by_hour = self._prefix[hi, :, :, cat] - self._prefix[lo, :, :, cat]
+        else:
+            by_hour = self._prefix[-1, :, :, cat] + self.counts[-1, :, :, cat]
+
+        if "hours" in filters:
+            counts = by_hour[list(filters["hours"])].sum(axis=0)
+        else:
+            counts = by_hour.sum(axis=0)
+
+        if "borough" in filters:
+            counts = np.where(self.nta_boroughs == filters["borough"], counts, 0)
+
+        return pd.Series(counts, index=self.nta_ids, name=category)
+
+
+def describe_filters(filters):
+    """short human text for a filter key, used as the map subtitle"""
+    filters = dict(filters or ())
+    parts = []
+    if "borough" in filters:
+        parts.append(filters["borough"])
+    if "start" in filters or "end" in filters:
+        parts.append(f"{filters.get('start', 'start')} to {filters.get('end', 'now')}")
+    if "hours" in filters:
+        hours = filters["hours"]
+        parts.append(f"{hours[0]:02d}:00-{(hours[-1] + 1) % HOURS:02d}:00")
+    return ", ".join(parts)
+
+
+def _parse_hours(value):
+    """"18-23" -> (18..23), "22-3" -> (22, 23, 0..3), "8" -> (8,)"""
+    try:
+        if "-" in value:
+            first, last = (int(part) for part in value.split("-", 1))
+        else:
+            first = last = int(value)
+    except ValueError:
+        raise ValueError(f"Invalid hours: {value}")
+    if not (0 <= first < HOURS and 0 <= last < HOURS):
+        raise ValueError(f"Hours must be between 0 and 23: {value}")
+
+    if first <= last:
+        return tuple(range(first, last + 1))
+    return tuple(range(first, HOURS)) + tuple(range(0, last + 1))
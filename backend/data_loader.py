@@ -0,0 +1,217 @@
+#streaming parquet loading so small cloud run instances don't hold the file twice in memory
+import ctypes
+import os
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+
+# the only columns the server ever touches
+SERVER_COLUMNS = ["Latitude", "Longitude", "ZIPCODE", "TYP_DESC"]
+# written by scripts/build_dataset.py, read when present so the server can skip deriving them
+DERIVED_COLUMNS = ["CRIME_BITS", "NTA2020"]
+# only feed the time buckets of the crime cube, a few thousand distinct values each
+TIME_COLUMNS = ["INCIDENT_DATE", "INCIDENT_TIME"]
+# low cardinality columns that become pandas categoricals
+CATEGORICAL_COLUMNS = ["ZIPCODE", "TYP_DESC", "NTA2020"] + TIME_COLUMNS
+FLOAT32_COLUMNS = ["Latitude", "Longitude"]
+# all a loaded dataset keeps per row once the maps and cube are derived, about 14 bytes a row
+RESIDENT_COLUMNS = SERVER_COLUMNS + ["CRIME_BITS", "NTA_CODE"]
+
+BATCH_SIZE = 256_000
+# CSV bytes parsed per batch
+CSV_BLOCK_SIZE = 64 << 20
+CACHE_DIR = os.getenv("DATA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "camp-data"))
+
+
+def cached_blob_path(bucket, blob_name, cache_dir=CACHE_DIR):
+    """
+    Stream a GCS blob to local disk (never into one bytes object) and return the path.
+    The file name carries the blob generation so a re-uploaded dataset is fetched again
+    and an unchanged one is reused across restarts on the same instance.
+    A name ending in "/" is a partitioned dataset and every part under it is mirrored.
+    """
+    if blob_name.endswith("/"):
+        return cached_prefix_path(bucket, blob_name, cache_dir)
+
+    blob = bucket.blob(blob_name)
+    blob.reload()
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{blob.generation}-{os.path.basename(blob_name)}")
+
+    if not os.path.exists(path):
+        # download next to the target then rename so a crash never leaves a half file behind
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".part")
+        os.close(fd)
+        try:
+            blob.download_to_filename(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        remove_old_generations(cache_dir, os.path.basename(blob_name), blob.generation)
+
+    return path
+
+
+def remove_old_generations(cache_dir, name, generation):
+    """
+    Drop the cached copies of earlier generations of name. On Cloud Run /tmp is memory and
+    counts against the instance's limit, so a superseded dataset mustn't stay behind.
+    """
+    keep = f"{generation}-{name}"
+    for entry in os.listdir(cache_dir):
+        prefix, _, rest = entry.partition("-")
+        if rest == name and prefix.isdigit() and entry != keep:
+            os.remove(os.path.join(cache_dir, entry))
+
+
+def cached_prefix_path(bucket, prefix, cache_dir=CACHE_DIR):
+    """mirror every blob under prefix into a local directory, unchanged parts are not fetched again"""
+    directory = os.path.join(cache_dir, prefix.strip("/").replace("/", "_"))
+
+    for blob in bucket.list_blobs(prefix=prefix):
+        rel = blob.name[len(prefix):]
+        if not rel or rel.endswith("/"):
+            continue
+        path = os.path.join(directory, *rel.split("/"))
+        part_dir, part_name = os.path.split(path)
+        # dot files are skipped by the parquet reader so the bookkeeping can live next to the parts
+        stamp = os.path.join(part_dir, f".{part_name}.{blob.generation}")
+        if os.path.exists(stamp):
+            continue
+
+        os.makedirs(part_dir, exist_ok=True)
+        tmp_path = os.path.join(part_dir, f".{part_name}.part")
+        blob.download_to_filename(tmp_path)
+        os.replace(tmp_path, path)
+        # the part was overwritten in place, only its older stamps are left to clear
+        for entry in os.listdir(part_dir):
+            if entry.startswith(f".{part_name}.") and entry[len(part_name) + 2:].isdigit():
+                os.remove(os.path.join(part_dir, entry))
+        open(stamp, "w").close()
+
+    return directory
+
+
+def clean_zip_codes(values):
+    """10001, 10001.0, ' 10001-1234' -> '10001', anything that isn't 5 digits -> null"""
+    text = pc.utf8_trim_whitespace(pc.cast(values, pa.string()))
+    text = pc.replace_substring_regex(text, r"\.0+$", "")
+    text = pc.utf8_slice_codeunits(text, 0, 5)
+    valid = pc.fill_null(pc.match_substring_regex(text, r"^\d{5}$"), False)
+    return pc.if_else(valid, text, pa.scalar(None, pa.string()))
+
+
+def _clean_zip_batch(batch):
+    """
+    batch with its ZIPCODE column (if any) through clean_zip_codes, dictionary encoded.
+    Only the distinct values get cleaned, rows are remapped onto the cleaned ones
+    """
+    if "ZIPCODE" not in batch.schema.names:
+        return batch
+    i = batch.schema.get_field_index("ZIPCODE")
+    column = batch.column(i)
+    if not pa.types.is_dictionary(column.type):
+        column = pc.dictionary_encode(column)
+    # 10001 and 10001.0 clean to the same text, so the cleaned dictionary is deduplicated
+    cleaned = clean_zip_codes(column.dictionary)
+    values = pc.unique(cleaned.drop_null())
+    indices = pc.take(pc.index_in(cleaned, value_set=values), column.indices)
+    columns = list(batch.columns)
+    columns[i] = pa.DictionaryArray.from_arrays(indices, values)
+    return pa.RecordBatch.from_arrays(columns, names=batch.schema.names)
+
+
+def _compact_batch(batch):
+    """downcast one record batch before it is kept around"""
+    columns = []
+    for name, column in zip(batch.schema.names, batch.columns):
+        if name in FLOAT32_COLUMNS:
+            column = pc.cast(column, pa.float32())
+        elif name in CATEGORICAL_COLUMNS and not pa.types.is_dictionary(column.type):
+            column = pc.dictionary_encode(column)
+        columns.append(column)
+    return pa.RecordBatch.from_arrays(columns, names=batch.schema.names)
+
+
+def read_crime_parquet(path, columns=SERVER_COLUMNS + DERIVED_COLUMNS + TIME_COLUMNS, batch_size=BATCH_SIZE):
+    """
+    Read a local parquet file (or a partitioned directory of them) row group by row group,
+    keeping only the columns we use, with float32 coordinates and categorical ZIPCODE / TYP_DESC.
+    Peak memory is the compact columns plus one batch instead of the whole file twice.
+    ZIP codes are cleaned like read_crime_csv cleans them, a parquet merged by pandas can hold
+    them as floats (10001.0) and appended parts have to land on the same ZIP index keys.
+    """
+    dataset = ds.dataset(path, format="parquet", partitioning="hive", ignore_prefixes=[".", "_"])
+    wanted = [c for c in columns if c in dataset.schema.names]
+
+    batches = [
+        _compact_batch(_clean_zip_batch(batch))
+        for batch in dataset.to_batches(columns=wanted, batch_size=batch_size)
+    ]
+    if batches:
+        table = pa.Table.from_batches(batches)
+    else:
+        table = dataset.schema.empty_table().select(wanted)
+    del batches
+
+    # every batch got its own dictionary, unify so pandas gets one set of categories
+    table = table.unify_dictionaries()
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def read_crime_csv(path, columns=SERVER_COLUMNS + TIME_COLUMNS, block_size=CSV_BLOCK_SIZE):
+    """
+    A raw CSV chunk (scripts/build_dataset.py input) as the same compact frame
+    read_crime_parquet gives, ZIP codes cleaned the way the dataset build cleans them.
+    """
+    convert_options = pacsv.ConvertOptions(
+        include_columns=columns,
+        include_missing_columns=True,
+        # chunks don't agree on ZIPCODE's type, read it as text and clean it ourselves
+        column_types={name: pa.string() for name in columns if name not in FLOAT32_COLUMNS},
+    )
+    reader = pacsv.open_csv(
+        path, read_options=pacsv.ReadOptions(block_size=block_size), convert_options=convert_options
+    )
+
+    batches = [_compact_batch(_clean_zip_batch(batch)) for batch in reader]
+    table = pa.Table.from_batches(batches) if batches else reader.schema.empty_table()
+    return table.unify_dictionaries().to_pandas(split_blocks=True, self_destruct=True)
+
+
+def resident_frame(df):
+    """
+    Only RESIDENT_COLUMNS, in their compact types: float32 coordinates, categorical ZIPCODE /
+    TYP_DESC, uint16 CRIME_BITS, int16 NTA_CODE. Columns that only fed derived data (dates,
+    NTA2020 names) are dropped. Already compact columns are shared with df, not copied.
+    """
+    columns = {}
+    for name in RESIDENT_COLUMNS:
+        column = df[name]
+        if name in FLOAT32_COLUMNS:
+            column = column.astype("float32", copy=False)
+        elif name in CATEGORICAL_COLUMNS and not isinstance(column.dtype, pd.CategoricalDtype):
+            column = column.astype("category")
+        elif name == "CRIME_BITS":
+            column = column.astype("uint16", copy=False)
+        elif name == "NTA_CODE":
+            column = column.astype("int16", copy=False)
+        columns[name] = column
+    return pd.DataFrame(columns, copy=False)
+
+
+def release_free_memory():
+    """
+    Hand the buffers a load freed back to the OS. Arrow's allocator and glibc's heap both keep
+    freed memory around for reuse, which after a load is hundreds of MB of RSS nothing will use.
+    """
+    pa.default_memory_pool().release_unused()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):  # not glibc, nothing to trim
+        pass
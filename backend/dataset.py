@@ -0,0 +1,164 @@
+#one loaded version of the crime data and everything derived from it, plus the reload jobs that
+#build the next one. Requests read the live Dataset once and use only that object, a reload
+#builds a whole new Dataset on the side and swaps it in with one assignment, so nobody ever
+#sees half of the old data next to half of the new
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# finished jobs kept around so /load/<job_id> can still answer after they're done
+JOB_HISTORY = 20
+
+
+class Dataset:
+    """
+    Frame, shapes and the derived indexes for one data version. Built once and never mutated
+    after that, a reload makes a new one instead. version keys every response cache, so
+    swapping datasets invalidates cached bodies without clearing anything.
+    """
+
+    __slots__ = (
+        "version", "base_version", "parts", "df", "shapes", "zip_index", "nta_counts", "cube",
+        "renderer", "sampler", "tiles", "spatial", "loaded_at",
+    )
+
+    def __init__(self, base_version, df, shapes, zip_index, nta_counts, cube, renderer, sampler, tiles, spatial,
+                 parts=()):
+        # base_version is the full load (source fingerprints), parts the incoming files appended on top
+        self.base_version = base_version
+        self.parts = tuple(parts)
+        self.version = dataset_version(base_version, self.parts)
+        self.df = df
+        self.shapes = shapes
+        self.zip_index = zip_index
+        self.nta_counts = nta_counts
+        self.cube = cube
+        self.renderer = renderer
+        self.sampler = sampler
+        self.tiles = tiles
+        self.spatial = spatial
+        self.loaded_at = time.time()
+
+    def summary(self):
+        return {
+            "version": self.version,
+            "base_version": self.base_version,
+            "parts": [name for name, _ in self.parts],
+            "rows": len(self.df),
+            "loaded_at": self.loaded_at,
+        }
+
+
+def dataset_version(base_version, parts):
+    """parts are (name, fingerprint) pairs, the same base plus the same parts is the same version"""
+    if not parts:
+        return base_version
+    digest = hashlib.sha256("\n".join(f"{name}:{fp}" for name, fp in parts).encode()).hexdigest()
+    return f"{base_version}+{digest[:8]}"
+
+
+class LoadJob:
+    """queued -> running -> done | failed, result is whatever the load function returned"""
+
+    __slots__ = ("id", "status", "force", "created_at", "started_at", "finished_at", "result", "error", "_done")
+
+    def __init__(self, force=False):
+        self.id = uuid.uuid4().hex[:12]
+        self.status = "queued"
+        self.force = force
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self._done = threading.Event()
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "force": self.force,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class LoadJobs:
+    """
+    At most one reload runs at a time. submit() while one is queued or running hands back that
+    same job instead of starting another, so a burst of /load calls costs one rebuild. A forced
+    submit can't ride along with a normal job (that one may keep the live data), so it gets one
+    forced job queued to run right after, which later forced submits share.
+    load(job) does the work on a background thread (a greenlet under gevent, the heavy parts
+    go to the cpu pool from there) and returns a JSON friendly result.
+    """
+
+    def __init__(self, load, history=JOB_HISTORY):
+        self.load = load
+        self.history = history
+        self._jobs = OrderedDict()
+        self._active = None
+        self._queued = None
+        self._lock = threading.Lock()
+
+    def submit(self, force=False):
+        """(job, True) for a new job, (running or queued job, False) when this request got coalesced"""
+        with self._lock:
+            if self._active is not None:
+                if not force or self._active.force:
+                    return self._active, False
+                if self._queued is not None:
+                    return self._queued, False
+                self._queued = self._add(LoadJob(force))
+                return self._queued, True
+            job = self._active = self._add(LoadJob(force))
+
+        self._start(job)
+        return job, True
+
+    def _add(self, job):
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.history:
+            self._jobs.popitem(last=False)
+        return job
+
+    def _start(self, job):
+        threading.Thread(target=self._run, args=(job,), daemon=True).start()
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    @property
+    def active(self):
+        return self._active
+
+    def _run(self, job):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = self.load(job)
+            job.status = "done"
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            job.error = str(e) or e.__class__.__name__
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                next_job, self._active, self._queued = self._queued, self._queued, None
+            job._done.set()
+            if next_job is not None:
+                self._start(next_job)
@@ -0,0 +1,222 @@
+#street level crime density as web mercator tiles, straight from the resident coordinate columns.
+#Zoomed out tiles are cut from a precomputed count pyramid, zoomed in ones histogram only the
+#rows under them, found through an offset index over rows sorted by pyramid cell
+import struct
+import zlib
+
+import numpy as np
+
+from crime_categories import CATEGORY_BITS
+
+TILE_SIZE = 256
+# bins per tile side, one bin is a 4x4 block of screen pixels
+TILE_BINS = 64
+BIN_PIXELS = TILE_SIZE // TILE_BINS
+MIN_ZOOM = 10
+MAX_ZOOM = 18
+# dense count grids for zooms up to here, about 10 MB for NYC's nine categories at zoom 12.
+# Past it a tile covers few enough rows that histogramming them per request is cheaper
+PYRAMID_MAX_ZOOM = 12
+# same ramp as the choropleths (folium's YlOrRd)
+YL_OR_RD = np.array([
+    (255, 255, 178), (254, 217, 118), (254, 178, 76), (253, 141, 60), (240, 59, 32), (189, 0, 38),
+], dtype=np.float64)
+MAX_LATITUDE = 85.05112878
+
+
+def mercator_bins(lon, lat, zoom):
+    """global bin column / row of each point at zoom, TILE_BINS bins per tile side"""
+    lat = np.radians(np.clip(np.asarray(lat, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE))
+    scale = float(TILE_BINS << zoom)
+    x = (np.asarray(lon, dtype=np.float64) + 180.0) / 360.0 * scale
+    y = (1.0 - np.arcsinh(np.tan(lat)) / np.pi) / 2.0 * scale
+    return np.floor(x).astype(np.int64), np.floor(y).astype(np.int64)
+
+
+class DensityTiles:
+    """
+    Built once per Dataset. Coordinates are kept as bins at MAX_ZOOM relative to an origin
+    aligned to a MIN_ZOOM tile, so shifting right by (MAX_ZOOM - z) gives the bin at any
+    zoom in between. tile_counts(category, z, x, y) is the TILE_BINS x TILE_BINS count grid
+    of one tile, png() / grid() render it.
+    """
+
+    def __init__(self, categories, origin, x, y, bits, offsets, pyramid, scales):
+        self.categories = list(categories)
+        self.origin = origin
+        self.x = x
+        self.y = y
+        self.bits = bits
+        self.offsets = offsets
+        self.pyramid = pyramid
+        self.scales = scales
+
+    @classmethod
+    def build(cls, df, categories):
+        """df needs Latitude, Longitude and CRIME_BITS, rows outside every NTA (NTA_CODE -1) are left out"""
+        lon = df["Longitude"].to_numpy()
+        lat = df["Latitude"].to_numpy()
+        keep = np.isfinite(lon) & np.isfinite(lat)
+        if "NTA_CODE" in df:
+            keep &= df["NTA_CODE"].to_numpy() >= 0
+        bx, by = mercator_bins(lon[keep], lat[keep], MAX_ZOOM)
+        bits = df["CRIME_BITS"].to_numpy()[keep]
+
+        # origin on a MIN_ZOOM tile corner, every zoom's tiles then line up with the grids
+        align = TILE_BINS << (MAX_ZOOM - MIN_ZOOM)
+        if len(bx):
+            origin = (int(bx.min()) // align * align, int(by.min()) // align * align)
+        else:
+            origin = (0, 0)
+        x, y = bx - origin[0], by - origin[1]
+        coord_dtype = np.uint16 if len(x) == 0 or max(x.max(), y.max()) < 2 ** 16 else np.uint32
+
+        # rows sorted by their PYRAMID_MAX_ZOOM cell, offsets[cell] is where each cell's rows start
+        shift = MAX_ZOOM - PYRAMID_MAX_ZOOM
+        cx, cy = x >> shift, y >> shift
+        width = int(cx.max()) + 1 if len(cx) else 1
+        height = int(cy.max()) + 1 if len(cy) else 1
+        # whole MIN_ZOOM tiles so every coarser level halves evenly
+        per_tile = TILE_BINS << (PYRAMID_MAX_ZOOM - MIN_ZOOM)
+        width = -(-width // per_tile) * per_tile
+        height = -(-height // per_tile) * per_tile
+        cell = cy * width + cx
+        order = np.argsort(cell, kind="stable")
+        offsets = np.zeros(width * height + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cell, minlength=width * height), out=offsets[1:])
+
+        pyramid, scales = {}, {}
+        grids = np.zeros((len(categories), height, width), dtype=np.int32)
+        for i, cat in enumerate(categories):
+            mask = (bits & CATEGORY_BITS[cat]) != 0
+            grids[i] = np.bincount(cell[mask], minlength=width * height).reshape(height, width)
+        for zoom in range(PYRAMID_MAX_ZOOM, MIN_ZOOM - 1, -1):
+            pyramid[zoom] = grids
+            scales[zoom] = [_scale(grid) for grid in grids]
+            n, h, w = grids.shape
+            grids = grids.reshape(n, h // 2, 2, w // 2, 2).sum(axis=(2, 4), dtype=np.int32)
+
+        return cls(
+            categories, origin,
+            x[order].astype(coord_dtype), y[order].astype(coord_dtype), bits[order],
+            offsets, pyramid, scales,
+        )
+
+    def __contains__(self, category):
+        return category in self.categories
+
+    @property
+    def rows(self):
+        return len(self.x)
+
+    @staticmethod
+    def has_tile(z, x, y):
+        return MIN_ZOOM <= z <= MAX_ZOOM and 0 <= x < (1 << z) and 0 <= y < (1 << z)
+
+    def scale(self, category, z):
+        """count at which a bin reaches the top of the ramp, bins shrink 4x per zoom past the pyramid"""
+        i = self.categories.index(category)
+        if z <= PYRAMID_MAX_ZOOM:
+            return self.scales[z][i]
+        return max(self.scales[PYRAMID_MAX_ZOOM][i] / 4 ** (z - PYRAMID_MAX_ZOOM), 1.0)
+
+    def tile_counts(self, category, z, x, y):
+        """int32 TILE_BINS x TILE_BINS incident counts of one tile, rows are north to south"""
+        i = self.categories.index(category)
+        # the tile's first bin relative to the origin, at zoom z
+        zoom_shift = MAX_ZOOM - z
+        bx0 = x * TILE_BINS - (self.origin[0] >> zoom_shift)
+        by0 = y * TILE_BINS - (self.origin[1] >> zoom_shift)
+
+        if z <= PYRAMID_MAX_ZOOM:
+            grid = self.pyramid[z][i]
+            out = np.zeros((TILE_BINS, TILE_BINS), dtype=np.int32)
+            # the part of the tile that overlaps the grid, nothing outside it has data
+            ys, xs = _overlap(by0, grid.shape[0]), _overlap(bx0, grid.shape[1])
+            if ys and xs:
+                out[ys[0] - by0:ys[1] - by0, xs[0] - bx0:xs[1] - bx0] = grid[ys[0]:ys[1], xs[0]:xs[1]]
+            return out
+
+        # cells of the offset index under this tile, one contiguous run of rows per cell row
+        cells_per_tile = TILE_BINS >> (z - PYRAMID_MAX_ZOOM)
+        height, width = self.pyramid[PYRAMID_MAX_ZOOM].shape[1:]
+        cx0 = bx0 >> (z - PYRAMID_MAX_ZOOM)
+        cy0 = by0 >> (z - PYRAMID_MAX_ZOOM)
+        ys, xs = _overlap(cy0, height, cells_per_tile), _overlap(cx0, width, cells_per_tile)
+        if not (ys and xs):
+            return np.zeros((TILE_BINS, TILE_BINS), dtype=np.int32)
+        rows = np.arange(ys[0], ys[1]) * width
+        starts, ends = self.offsets[rows + xs[0]], self.offsets[rows + xs[1]]
+        index = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)]) if len(rows) else []
+        if len(index) == 0:
+            return np.zeros((TILE_BINS, TILE_BINS), dtype=np.int32)
+
+        index = index[(self.bits[index] & CATEGORY_BITS[category]) != 0]
+        tx = (self.x[index].astype(np.int64) >> zoom_shift) - bx0
+        ty = (self.y[index].astype(np.int64) >> zoom_shift) - by0
+        counts = np.bincount(ty * TILE_BINS + tx, minlength=TILE_BINS * TILE_BINS)
+        return counts.astype(np.int32).reshape(TILE_BINS, TILE_BINS)
+
+    def png(self, category, z, x, y):
+        """TILE_SIZE square RGBA PNG, empty bins transparent"""
+        counts = self.tile_counts(category, z, x, y)
+        if not counts.any():
+            return EMPTY_TILE
+        return encode_png(colorize(counts, self.scale(category, z)))
+
+    def grid(self, category, z, x, y):
+        """JSON friendly sparse grid: [row, column, count] for every non empty bin"""
+        counts = self.tile_counts(category, z, x, y)
+        rows, cols = np.nonzero(counts)
+        return {
+            "category": category,
+            "z": z, "x": x, "y": y,
+            "bins": TILE_BINS,
+            "scale": self.scale(category, z),
+            "cells": np.column_stack([rows, cols, counts[rows, cols]]).tolist(),
+        }
+
+
+def _overlap(start, size, length=TILE_BINS):
+    """[lo, hi) of start..start+length clipped to 0..size, None if they don't meet"""
+    lo, hi = max(start, 0), min(start + length, size)
+    return (lo, hi) if lo < hi else None
+
+
+def _scale(grid):
+    """99th percentile of the non empty bins, a handful of extreme corners shouldn't wash out the rest"""
+    nonzero = grid[grid > 0]
+    return float(np.percentile(nonzero, 99)) if len(nonzero) else 1.0
+
+
+def colorize(counts, scale):
+    """counts to TILE_SIZE square RGBA on a log ramp, each bin a BIN_PIXELS block"""
+    level = np.clip(np.log1p(counts) / np.log1p(max(scale, 1.0)), 0.0, 1.0)
+    position = level * (len(YL_OR_RD) - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, len(YL_OR_RD) - 1)
+    frac = (position - lower)[..., None]
+    rgb = YL_OR_RD[lower] * (1 - frac) + YL_OR_RD[upper] * frac
+    alpha = np.where(counts > 0, 110 + 145 * level, 0)
+    rgba = np.dstack([rgb, alpha]).round().astype(np.uint8)
+    return rgba.repeat(BIN_PIXELS, axis=0).repeat(BIN_PIXELS, axis=1)
+
+
+def encode_png(rgba):
+    """8 bit RGBA PNG from an (h, w, 4) uint8 array, no filtering, zlib does the work"""
+    height, width = rgba.shape[:2]
+    # every scanline starts with its filter type, 0 = none
+    raw = np.concatenate([np.zeros((height, 1), dtype=np.uint8), rgba.reshape(height, width * 4)], axis=1)
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        _chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)),
+        _chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)),
+        _chunk(b"IEND", b""),
+    ])
+
+
+def _chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+EMPTY_TILE = encode_png(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8))
@@ -0,0 +1,88 @@
+#geoguesser room and player records. __slots__ keeps thousands of live rooms small,
+#to_dict / from_dict is the wire format for the external game store and the socket payloads
+import time
+
+# finished rooms only need to outlive the results screen, abandoned ones a lot longer
+FINISHED_ROOM_TTL_SECONDS = 10 * 60
+IDLE_ROOM_TTL_SECONDS = 2 * 3600
+
+
+class Player:
+    __slots__ = ("name", "score", "guess")
+
+    def __init__(self, name, score=0, guess=None):
+        self.name = name
+        self.score = score
+        self.guess = guess
+
+    def to_dict(self):
+        return {"name": self.name, "score": self.score, "guess": self.guess}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["name"], data.get("score", 0), data.get("guess"))
+
+
+class Room:
+    """players keeps join order, the first sid is the host"""
+
+    __slots__ = (
+        "players", "max_players", "current_round", "total_rounds", "current_location", "status",
+        "stratum", "seed", "round_start_time", "updated_at",
+    )
+
+    def __init__(self, total_rounds, stratum=None, seed=None, max_players=2):
+        self.players = {}
+        self.max_players = max_players
+        self.current_round = 0
+        self.total_rounds = total_rounds
+        self.current_location = None
+        self.status = "waiting"
+        self.stratum = stratum
+        self.seed = seed
+        self.round_start_time = None
+        self.updated_at = time.time()
+
+    @property
+    def host(self):
+        return next(iter(self.players), None)
+
+    def players_payload(self):
+        """{sid: {"name", "score", "guess"}}, the shape the frontend has always received"""
+        return {sid: player.to_dict() for sid, player in self.players.items()}
+
+    def touch(self):
+        self.updated_at = time.time()
+
+    def ttl(self):
+        return FINISHED_ROOM_TTL_SECONDS if self.status == "game_end" else IDLE_ROOM_TTL_SECONDS
+
+    def expired(self, now=None):
+        return (now if now is not None else time.time()) - self.updated_at > self.ttl()
+
+    def to_dict(self):
+        return {
+            "players": [[sid, player.to_dict()] for sid, player in self.players.items()],
+            "max_players": self.max_players,
+            "current_round": self.current_round,
+            "total_rounds": self.total_rounds,
+            "current_location": self.current_location,
+            "status": self.status,
+            "stratum": self.stratum,
+            "seed": self.seed,
+            "round_start_time": self.round_start_time,
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        # JSON turned the stratum's pairs into lists, the location sampler needs it hashable
+        stratum = tuple(tuple(pair) for pair in data["stratum"]) if data.get("stratum") else None
+        room = cls(data["total_rounds"], stratum, data.get("seed"), data.get("max_players", 2))
+        room.players = {sid: Player.from_dict(player) for sid, player in data["players"]}
+        room.current_round = data["current_round"]
+        room.current_location = data.get("current_location")
+        room.status = data["status"]
+        room.round_start_time = data.get("round_start_time")
+        room.updated_at = data.get("updated_at", room.updated_at)
+        return room
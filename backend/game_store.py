@@ -0,0 +1,257 @@
+#where geoguesser rooms live. In process memory for a single worker, or a redis compatible
+#server so every gunicorn worker and Cloud Run instance sees the same rooms.
+#Both keep a socket id -> room index so a disconnect never has to look at every room
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from game_state import Room
+
+try:
+    import redis
+except ImportError:  # only needed when GAME_STORE_URL points at a redis server
+    redis = None
+
+LOCK_TIMEOUT_SECONDS = 5
+KEY_PREFIX = "camp:game:"
+LOCK_PREFIX = "camp:lock:"
+SID_PREFIX = "camp:sid:"
+
+
+class MemoryGameStore:
+    """
+    Rooms as Room objects in this process. get() hands back the live object so save()
+    only refreshes the sid index and the expiry clock, but callers still call it so
+    swapping stores changes nothing.
+    """
+
+    def __init__(self):
+        self._games = {}
+        self._rooms_by_sid = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def get(self, room_code):
+        return self._games.get(room_code)
+
+    def create(self, room_code, game):
+        """False if the code is already taken"""
+        with self._guard:
+            if room_code in self._games:
+                return False
+            self._games[room_code] = game
+            self._locks[room_code] = threading.Lock()
+            self._index(room_code, game)
+            return True
+
+    def save(self, room_code, game):
+        game.touch()
+        with self._guard:
+            self._games[room_code] = game
+            self._index(room_code, game)
+
+    def _index(self, room_code, game):
+        for sid in game.players:
+            self._rooms_by_sid[sid] = room_code
+
+    def delete(self, room_code):
+        with self._guard:
+            game = self._games.pop(room_code, None)
+            self._locks.pop(room_code, None)
+            for sid in game.players if game is not None else ():
+                if self._rooms_by_sid.get(sid) == room_code:
+                    del self._rooms_by_sid[sid]
+
+    def room_of(self, sid):
+        """room code a socket is playing in, None if it isn't in one"""
+        return self._rooms_by_sid.get(sid)
+
+    def forget_player(self, sid):
+        with self._guard:
+            self._rooms_by_sid.pop(sid, None)
+
+    def expire(self, now=None):
+        """drop finished and abandoned rooms, returns their codes"""
+        now = now if now is not None else time.time()
+        expired = [code for code, game in list(self._games.items()) if game.expired(now)]
+        for code in expired:
+            self.delete(code)
+        return expired
+
+    def room_codes(self):
+        return list(self._games)
+
+    def __contains__(self, room_code):
+        return room_code in self._games
+
+    def __len__(self):
+        return len(self._games)
+
+    @contextmanager
+    def lock(self, room_code):
+        """
+        serialises read-modify-save of one room, e.g. two guesses landing together. Locks live
+        from create() to delete(), a code with no room gets a throwaway lock so made up codes
+        from clients never pile up here
+        """
+        with self._guard:
+            room_lock = self._locks.get(room_code) or threading.Lock()
+        with room_lock:
+            yield
+
+
+class RedisGameStore:
+    """
+    Rooms as JSON strings in a redis compatible server. Every save resets the key's TTL
+    to Room.ttl(), so finished and abandoned rooms expire on the server by themselves.
+    Only GET / SET (NX, EX, PX) / DELETE / SCAN are used, so FakeRedis below
+    (or any other stand-in with those) works in place of a real server.
+    """
+
+    def __init__(self, client, prefix=KEY_PREFIX):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        if redis is None:
+            raise RuntimeError("GAME_STORE_URL is set but the redis package is not installed")
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _key(self, room_code):
+        return f"{self.prefix}{room_code}"
+
+    def get(self, room_code):
+        raw = self.client.get(self._key(room_code))
+        return Room.from_dict(json.loads(raw)) if raw is not None else None
+
+    def create(self, room_code, game):
+        if not self.client.set(self._key(room_code), _dumps(game), ex=game.ttl(), nx=True):
+            return False
+        self._index(room_code, game)
+        return True
+
+    def save(self, room_code, game):
+        game.touch()
+        self.client.set(self._key(room_code), _dumps(game), ex=game.ttl())
+        self._index(room_code, game)
+
+    def _index(self, room_code, game):
+        for sid in game.players:
+            self.client.set(f"{SID_PREFIX}{sid}", room_code, ex=game.ttl())
+
+    def delete(self, room_code):
+        game = self.get(room_code)
+        self.client.delete(self._key(room_code))
+        for sid in game.players if game is not None else ():
+            if self.room_of(sid) == room_code:
+                self.client.delete(f"{SID_PREFIX}{sid}")
+
+    def room_of(self, sid):
+        return _text(self.client.get(f"{SID_PREFIX}{sid}"))
+
+    def forget_player(self, sid):
+        self.client.delete(f"{SID_PREFIX}{sid}")
+
+    def expire(self, now=None):
+        """nothing to do, the server drops rooms and sid entries when their TTL runs out"""
+        return []
+
+    def room_codes(self):
+        start = len(self.prefix)
+        return [_text(key)[start:] for key in self.client.scan_iter(match=f"{self.prefix}*")]
+
+    def __contains__(self, room_code):
+        return self.client.get(self._key(room_code)) is not None
+
+    def __len__(self):
+        return len(self.room_codes())
+
+    @contextmanager
+    def lock(self, room_code, timeout=LOCK_TIMEOUT_SECONDS):
+        """
+        SET NX PX lock so two workers can't interleave a read-modify-save of one room.
+        Expires on its own if the holder dies, release only deletes our own token.
+        """
+        key = f"{LOCK_PREFIX}{room_code}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        while not self.client.set(key, token, nx=True, px=int(timeout * 1000)):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"room {room_code} is locked")
+            time.sleep(0.005)
+        try:
+            yield
+        finally:
+            if _text(self.client.get(key)) == token:
+                self.client.delete(key)
+
+
+class FakeRedis:
+    """
+    Just enough of the redis client API for RedisGameStore, in memory. Stands in for a
+    server when running locally or in tests, values come back as bytes like redis-py.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def _alive(self, key):
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def get(self, key):
+        with self._lock:
+            return self._data[key] if self._alive(key) else None
+
+    def set(self, key, value, ex=None, px=None, nx=False):
+        with self._lock:
+            if nx and self._alive(key):
+                return None
+            self._data[key] = value.encode("utf-8") if isinstance(value, str) else value
+            if ex is not None or px is not None:
+                self._expires[key] = time.monotonic() + (ex if ex is not None else px / 1000)
+            else:
+                self._expires.pop(key, None)
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                removed += self._alive(key)
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+            return removed
+
+    def scan_iter(self, match=None):
+        prefix = (match or "*").rstrip("*")
+        with self._lock:
+            keys = [k for k in list(self._data) if k.startswith(prefix) and self._alive(k)]
+        return iter(k.encode("utf-8") for k in keys)
+
+
+def make_game_store(url=None):
+    """GAME_STORE_URL picks the store: unset -> memory, "fake://" -> FakeRedis, else a redis url"""
+    url = url if url is not None else os.getenv("GAME_STORE_URL", "")
+    if not url:
+        return MemoryGameStore()
+    if url.startswith("fake://"):
+        return RedisGameStore(FakeRedis())
+    return RedisGameStore.from_url(url)
+
+
+def _dumps(game):
+    return json.dumps(game.to_dict(), separators=(",", ":"))
+
+
+def _text(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
@@ -0,0 +1,146 @@
+#pre-compressed, ETagged bodies for the big static responses (folium maps, NTA geojson)
+#each body is compressed once per data version, after that a request is a dict lookup and a 304 is free
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # gzip alone still covers every browser
+    brotli = None
+
+# None sends no-cache: clients keep the body but revalidate it every time, so a /load swap shows
+# up on the next request instead of after a max-age, and an unchanged body is still only a 304
+DEFAULT_MAX_AGE = None
+
+
+class CompressedBody:
+    """
+    one response body in every encoding we serve, with a strong ETag per encoding.
+    compress=False keeps identity only, for bodies that are compressed already (PNG)
+    """
+
+    __slots__ = ("encodings", "etag")
+
+    def __init__(self, body, compress=True):
+        raw = body.encode("utf-8") if isinstance(body, str) else body
+        self.etag = hashlib.sha256(raw).hexdigest()[:32]
+        self.encodings = {"identity": raw}
+        if not compress:
+            return
+        self.encodings["gzip"] = gzip.compress(raw, compresslevel=9, mtime=0)
+        if brotli is not None:
+            self.encodings["br"] = brotli.compress(raw, quality=11)
+
+    def etag_for(self, encoding):
+        # strong validators have to differ between encodings of the same content
+        return self.etag if encoding == "identity" else f"{self.etag}-{encoding}"
+
+    def all_etags(self):
+        return {self.etag_for(encoding) for encoding in self.encodings}
+
+
+class ResponseCache:
+    """
+    CompressedBody per key for one data version. Bumping the version drops every
+    entry, so a reload can never serve a body built from the old data.
+    run, if given, executes the build + compression (e.g. WorkerPool.run).
+    max_entries bounds the cache (least recently used goes first) for key spaces too
+    big to keep whole, like map tiles. compress is passed on to CompressedBody.
+    """
+
+    def __init__(self, run=None, max_entries=None, compress=True):
+        self._run = run
+        self.max_entries = max_entries
+        self.compress = compress
+        self._lock = threading.Lock()
+        self._version = None
+        self._entries = OrderedDict()
+
+    def get(self, key, version, build):
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._entries = OrderedDict()
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None:
+            return entry
+
+        # compress outside the lock, two racing builders just produce the same bytes
+        if self._run is not None:
+            entry = self._run(lambda: CompressedBody(build(), self.compress))
+        else:
+            entry = CompressedBody(build(), self.compress)
+        with self._lock:
+            if version == self._version:
+                self._entries.setdefault(key, entry)
+                entry = self._entries[key]
+                while self.max_entries is not None and len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._version = None
+            self._entries = OrderedDict()
+
+
+def pick_encoding(accept_encoding, available):
+    """best encoding the client accepts, br over gzip over identity"""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+
+    for encoding in ("br", "gzip"):
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return "identity"
+
+
+def _if_none_match(header):
+    """ETags in an If-None-Match header, with W/ dropped since proxies weaken the ones they recompress"""
+    tags = set()
+    for tag in (header or "").split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        tags.add(tag.strip('"'))
+    return tags
+
+
+def cached_response(request, entry, mimetype, max_age=DEFAULT_MAX_AGE):
+    """200 with the best encoding, or 304 if the client already holds any encoding of this body"""
+    encoding = pick_encoding(request.headers.get("Accept-Encoding"), entry.encodings)
+    etag = entry.etag_for(encoding)
+
+    client_tags = _if_none_match(request.headers.get("If-None-Match"))
+    if "*" in client_tags or client_tags & entry.all_etags():
+        response = Response(status=304)
+    else:
+        response = Response(entry.encodings[encoding], mimetype=mimetype)
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "public, no-cache" if max_age is None else f"public, max-age={max_age}"
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
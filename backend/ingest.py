@@ -0,0 +1,80 @@
+#daily updates without a full rebuild: new CSV chunks or parquet parts get classified and NTA
+#joined on their own, their counts are added onto the live dataset's and everything comes back
+#as new objects so the dataset being appended to keeps serving untouched
+import os
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from crime_categories import add_category_bits
+from crime_cube import CrimeCube
+from data_loader import read_crime_csv, read_crime_parquet
+from map_data import nta_category_counts
+from nta_join import row_nta_codes
+from zip_index import update_zip_crime_index
+
+PART_SUFFIXES = (".csv", ".parquet")
+
+
+def is_part(name):
+    """incoming files we know how to read, dot / underscore files are bookkeeping"""
+    base = os.path.basename(name)
+    return base.endswith(PART_SUFFIXES) and not base.startswith((".", "_"))
+
+
+def read_crime_part(path):
+    """one incoming file as a compact frame, raw CSV chunk or parquet part"""
+    if path.endswith(".csv"):
+        return read_crime_csv(path)
+    return read_crime_parquet(path)
+
+
+def concat_rows(frames, columns=None):
+    """
+    Stack frames keeping categoricals categorical (plain pd.concat turns differing
+    categories into object columns). columns defaults to the first frame's, missing
+    ones are filled with NaN.
+    """
+    columns = list(columns if columns is not None else frames[0].columns)
+    out = {}
+    for column in columns:
+        first = frames[0][column]
+        parts = [
+            frame[column] if column in frame else pd.Series(np.nan, index=frame.index).astype(first.dtype)
+            for frame in frames
+        ]
+        if isinstance(first.dtype, pd.CategoricalDtype):
+            parts = [p if isinstance(p.dtype, pd.CategoricalDtype) else p.astype("category") for p in parts]
+            if len({p.cat.categories.dtype for p in parts}) > 1:
+                # e.g. float ZIP codes in an old parquet next to a cleaned CSV, compare them as text
+                parts = [p.cat.rename_categories(p.cat.categories.astype(str)) for p in parts]
+            out[column] = union_categoricals(parts, ignore_order=True)
+        else:
+            out[column] = np.concatenate([np.asarray(p, dtype=first.dtype) for p in parts])
+    return pd.DataFrame(out, copy=False)
+
+
+def append_rows(df, new_frames, shapes, nta_counts, zip_index, cube):
+    """
+    Fold new_frames (one per incoming part) into the derived data of df. Only the new rows are
+    classified, NTA joined and counted. Returns (df, nta_counts, zip_index, cube, changed
+    categories), all new objects. Nothing passed in is modified apart from the new frames
+    gaining CRIME_BITS / NTA_CODE.
+    """
+    delta = pd.DataFrame(0, index=nta_counts.index, columns=nta_counts.columns)
+    # update_zip_crime_index replaces entries, so a copy of the dict leaves the old index intact
+    new_zip_index = dict(zip_index)
+    for rows in new_frames:
+        if "CRIME_BITS" not in rows:
+            add_category_bits(rows)
+        rows["NTA_CODE"] = row_nta_codes(rows, shapes)
+
+        delta += nta_category_counts(rows["NTA_CODE"], rows["CRIME_BITS"], nta_counts.index, nta_counts.columns)
+
+        # each part is bucketed on its own, it may carry date columns the old rows don't
+        cube = cube.merged(CrimeCube.build(rows, cube.nta_ids, cube.nta_boroughs, cube.categories))
+        update_zip_crime_index(new_zip_index, rows)
+
+    changed = [cat for cat in nta_counts.columns if delta[cat].any()]
+    return concat_rows([df, *new_frames], df.columns), nta_counts + delta, new_zip_index, cube, changed
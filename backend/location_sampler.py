@@ -0,0 +1,182 @@
+#random geoguesser round locations in O(1): compact arrays built once at load, a draw is one
+#random integer and a dict copy instead of df.sample over millions of rows
+import threading
+
+import numpy as np
+
+from crime_categories import CATEGORY_BITS, MAP_CATEGORIES
+from zip_index import compact_zip_crime_counts
+
+# rough NYC bounding box, anything outside is a geocoding mistake
+NYC_BOUNDS = {"lat": (40.45, 40.95), "lon": (-74.30, -73.65)}
+# easy rounds are the ones nearest midtown, hard ones the furthest out
+MIDTOWN = (40.7580, -73.9855)
+DIFFICULTIES = ("easy", "medium", "hard")
+STRATA = ("borough", "category", "difficulty")
+MAX_CACHED_STRATA = 64
+
+STREET_VIEW_URL = "https://maps.googleapis.com/maps/api/streetview?size=600x400&location={lat},{lon}&key={key}"
+
+
+class LocationSampler:
+    """
+    Uniform draws over valid crime locations, optionally restricted to a stratum
+    (any mix of borough / category / difficulty). Rows of a stratum are found once
+    and kept as an index array, so every later draw is constant time.
+    A seed makes a draw reproducible: the same (seed, round) always gives the same spot.
+    """
+
+    def __init__(self, lat, lon, zip_codes, zip_labels, borough_codes, boroughs, crime_bits,
+                 zip_payloads, street_view_key="", seed=None):
+        self.lat = lat
+        self.lon = lon
+        self.zip_codes = zip_codes
+        self.zip_labels = zip_labels
+        self.borough_codes = borough_codes
+        self.boroughs = boroughs
+        self.crime_bits = crime_bits
+        self.zip_payloads = zip_payloads
+        self.street_view_key = street_view_key
+
+        # distance from midtown split into thirds, computed once for every row
+        dist = np.hypot(self.lat - MIDTOWN[0], (self.lon - MIDTOWN[1]) * np.cos(np.radians(MIDTOWN[0])))
+        cuts = np.quantile(dist, [1 / 3, 2 / 3]) if len(dist) else np.zeros(2)
+        self.difficulty = np.searchsorted(cuts, dist).astype(np.int8)
+
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._strata = {}
+
+    @classmethod
+    def build(cls, df, nta_boroughs, zip_index, street_view_key="", seed=None):
+        """df needs Latitude, Longitude, ZIPCODE, CRIME_BITS and NTA_CODE (-1 outside every NTA)"""
+        lat = df["Latitude"].to_numpy(dtype=np.float32)
+        lon = df["Longitude"].to_numpy(dtype=np.float32)
+
+        zips = df["ZIPCODE"]
+        if not hasattr(zips, "cat"):
+            zips = zips.astype("category")
+        zip_codes = zips.cat.codes.to_numpy()
+        zip_values = list(zips.cat.categories)
+
+        valid = (
+            np.isfinite(lat) & np.isfinite(lon)
+            & (lat >= NYC_BOUNDS["lat"][0]) & (lat <= NYC_BOUNDS["lat"][1])
+            & (lon >= NYC_BOUNDS["lon"][0]) & (lon <= NYC_BOUNDS["lon"][1])
+            & (zip_codes >= 0)
+        )
+
+        # boroughs become small codes, -1 for rows outside every NTA
+        nta_code = df["NTA_CODE"].to_numpy()
+        boroughs = sorted({b for b in nta_boroughs if isinstance(b, str) and b})
+        borough_of_nta = np.array([boroughs.index(b) if b in boroughs else -1 for b in nta_boroughs] + [-1], dtype=np.int8)
+        borough_codes = borough_of_nta[np.where(nta_code >= 0, nta_code, len(nta_boroughs))]
+
+        # the chart for a ZIP is the same every time, format it once per ZIP
+        zip_labels = [str(z) for z in zip_values]
+        zip_payloads = [compact_zip_crime_counts(zip_index, z) for z in zip_values]
+
+        zip_dtype = np.int16 if len(zip_values) < np.iinfo(np.int16).max else np.int32
+        return cls(
+            lat[valid],
+            lon[valid],
+            zip_codes[valid].astype(zip_dtype),
+            zip_labels,
+            borough_codes[valid],
+            boroughs,
+            df["CRIME_BITS"].to_numpy()[valid],
+            zip_payloads,
+            street_view_key=street_view_key,
+            seed=seed,
+        )
+
+    def __len__(self):
+        return len(self.lat)
+
+    def parse_stratum(self, options):
+        """
+        Normalise {"borough", "category", "difficulty"} (any subset, any case) into a
+        hashable stratum key, None for no restriction. Raises ValueError on unknown values.
+        """
+        key = {}
+        for dim in STRATA:
+            value = str(options.get(dim) or "").strip()
+            if not value:
+                continue
+            if dim == "borough":
+                choices = self.boroughs
+            elif dim == "category":
+                choices = MAP_CATEGORIES
+            else:
+                choices = DIFFICULTIES
+            match = [c for c in choices if c.lower() == value.lower()]
+            if not match:
+                raise ValueError(f"Invalid {dim}: {value}")
+            key[dim] = match[0]
+
+        key = tuple(sorted(key.items())) or None
+        if key is not None and len(self._indices(key)) == 0:
+            raise ValueError("No crime locations match that selection")
+        return key
+
+    def _indices(self, key):
+        """row indices of a stratum, built on first use"""
+        with self._lock:
+            indices = self._strata.get(key)
+        if indices is not None:
+            return indices
+
+        mask = np.ones(len(self), dtype=bool)
+        for dim, value in key:
+            if dim == "borough":
+                mask &= self.borough_codes == self.boroughs.index(value)
+            elif dim == "category":
+                mask &= (self.crime_bits & CATEGORY_BITS[value]) != 0
+            else:
+                mask &= self.difficulty == DIFFICULTIES.index(value)
+        indices = np.flatnonzero(mask).astype(np.int32)
+
+        with self._lock:
+            if len(self._strata) >= MAX_CACHED_STRATA:
+                self._strata = {}
+            self._strata[key] = indices
+        return indices
+
+    def sample_index(self, stratum=None, seed=None, round_no=0):
+        indices = None if stratum is None else self._indices(stratum)
+        n = len(self) if indices is None else len(indices)
+        if n == 0:
+            return None
+
+        if seed is None:
+            with self._lock:
+                pick = int(self._rng.integers(n))
+        else:
+            pick = int(np.random.default_rng([int(seed), int(round_no)]).integers(n))
+        return pick if indices is None else int(indices[pick])
+
+    def sample(self, stratum=None, seed=None, round_no=0):
+        """full round payload for a random location, None if nothing matches"""
+        i = self.sample_index(stratum, seed, round_no)
+        if i is None:
+            return None
+        return self.payload(i)
+
+    def payload(self, i):
+        """round payload for row i, the ZIP chart is shared and must not be mutated"""
+        lat, lon = float(self.lat[i]), float(self.lon[i])
+        zip_code = self.zip_codes[i]
+        if self.street_view_key:
+            street_view_url = STREET_VIEW_URL.format(lat=lat, lon=lon, key=self.street_view_key)
+        else:
+            street_view_url = ""
+
+        return {
+            "latitude": lat,
+            "longitude": lon,
+            "street_view_url": street_view_url,
+            "zip_code": self.zip_labels[zip_code],
+            "crime_counts": self.zip_payloads[zip_code],
+            "borough": self.boroughs[self.borough_codes[i]] if self.borough_codes[i] >= 0 else None,
+            "difficulty": DIFFICULTIES[self.difficulty[i]],
+        }
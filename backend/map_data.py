@@ -0,0 +1,74 @@
+#choropleths as data: one simplified NTA geometry document plus tiny per category count payloads
+#the frontend styles the polygons itself so switching category only moves a few KB
+import json
+
+import numpy as np
+import pandas as pd
+import shapely
+
+from crime_categories import category_rows
+
+# ~10m at NYC's latitude, invisible at city zoom and shrinks the geojson several times over
+SIMPLIFY_TOLERANCE_DEG = 0.0001
+COORD_PRECISION = 5
+NTA_PROPERTIES = ["NTA2020", "NTAName", "BoroName"]
+
+
+def simplified_nta_geojson(shapes, tolerance=SIMPLIFY_TOLERANCE_DEG, precision=COORD_PRECISION):
+    """
+    Serialized FeatureCollection of the NTA shapes, simplified and with rounded
+    coordinates. Built once and cached by the caller, it never changes between reloads
+    of the crime data.
+    """
+    if shapes.crs is not None and shapes.crs.to_epsg() != 4326:
+        shapes = shapes.to_crs("EPSG:4326")
+
+    geometries = shapely.simplify(shapes.geometry.values, tolerance, preserve_topology=True)
+    geometries = shapely.set_precision(geometries, 10 ** -precision)
+    properties = [c for c in NTA_PROPERTIES if c in shapes.columns]
+
+    features = []
+    for i, geometry in enumerate(geometries):
+        features.append({
+            "type": "Feature",
+            "id": str(shapes["NTA2020"].iloc[i]),
+            "properties": {c: _plain(shapes[c].iloc[i]) for c in properties},
+            "geometry": json.loads(shapely.to_geojson(geometry)),
+        })
+
+    return json.dumps({"type": "FeatureCollection", "features": features}, separators=(",", ":"))
+
+
+def nta_category_counts(nta_code, bits, nta_ids, categories):
+    """
+    NTA x category incident counts (DataFrame indexed by NTA2020) straight from the NTA_CODE
+    and CRIME_BITS columns, rows outside every NTA (-1) are skipped. No joined or filtered frames.
+    """
+    nta_code = np.asarray(nta_code)
+    inside = np.flatnonzero(nta_code >= 0)
+    codes = nta_code[inside]
+    bits = np.asarray(bits)[inside]
+    return pd.DataFrame(
+        {cat: np.bincount(codes[category_rows(bits, cat)], minlength=len(nta_ids)) for cat in categories},
+        index=pd.Index(nta_ids, name="NTA2020"),
+    )
+
+
+def category_counts_payload(nta_counts, category, filters=None):
+    """
+    {"category", "filters", "counts": {NTA2020: n}, "max", "total"} for one category, zero
+    counts left out. nta_counts is the all-time DataFrame or a filtered Series from the cube.
+    """
+    column = nta_counts[category] if hasattr(nta_counts, "columns") else nta_counts
+    counts = {str(nta): int(n) for nta, n in column.items() if n > 0}
+    return {
+        "category": category,
+        "filters": dict(filters or ()),
+        "counts": counts,
+        "max": int(column.max()) if len(column) else 0,
+        "total": int(column.sum()),
+    }
+
+
+def _plain(value):
+    return value.item() if hasattr(value, "item") else value
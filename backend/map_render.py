@@ -0,0 +1,210 @@
+#folium choropleths rendered when first asked for and kept in a size bounded LRU
+#instead of rendering every category before the server counts as loaded
+import os
+import threading
+from collections import OrderedDict
+
+import folium
+from folium import GeoJson
+from folium.features import GeoJsonTooltip, Element
+
+from crime_cube import describe_filters
+from http_cache import CompressedBody
+from metrics import span
+
+MAX_RENDERED_MAPS = int(os.getenv("MAX_RENDERED_MAPS", "9"))
+# filtered maps get their own LRU so a run of distinct filters can't evict the all-time ones
+MAX_FILTERED_MAPS = int(os.getenv("MAX_FILTERED_MAPS", "9"))
+# the frontend opens on ASSAULT then lists the rest alphabetically, warm them in that order
+PREWARM_ORDER = [
+    "ASSAULT", "BURGLARY", "DRUGS", "HARASSMENT", "ROBBERY",
+    "SHOOTINGS", "THEFT", "VANDALISM", "VEHICLE THEFT",
+]
+
+
+def render_choropleth(shapes_gdf, counts, cat, subtitle=None):
+    """full folium html for one category, counts is a Series of incidents indexed by NTA2020"""
+    counts = counts.rename("count").rename_axis("NTA2020").reset_index()
+    shapes_with_counts = shapes_gdf.merge(counts, on="NTA2020", how="left").fillna(0)
+
+    m = folium.Map(location=[40.7128, -74.0060], zoom_start=11, tiles="CartoDB dark_matter")
+    folium.Choropleth(
+        geo_data=shapes_with_counts,
+        data=shapes_with_counts,
+        columns=["NTA2020", "count"],
+        key_on="feature.properties.NTA2020",
+        fill_color="YlOrRd",
+        fill_opacity=0.8,
+        line_opacity=0.3,
+        nan_fill_color="gray",
+        legend_name=f"{cat} Incidents"
+    ).add_to(m)
+
+    GeoJson(
+        shapes_with_counts,
+        style_function=lambda feature: {
+            "fillColor": "transparent",
+            "color": "transparent",
+            "weight": 0
+        },
+        tooltip=GeoJsonTooltip(
+            fields=["NTAName", "count"],
+            aliases=["Neighborhood:", "Incidents:"],
+            localize=True,
+            sticky=True,
+        )
+    ).add_to(m)
+
+    map_title = f"{cat} in NYC"
+    subtitle = f"Neighborhood incident counts, {subtitle}" if subtitle else "Neighborhood incident counts"
+    title_html = f"""
+        <div style="
+            position: fixed;
+            top: 10px;
+            left: 50%;
+            transform: translateX(-50%);
+            z-index: 9999;
+            background-color: rgba(0, 0, 0, 0.6);
+            padding: 6px 10px;
+            border-radius: 4px;
+            color: white;
+            font-size: 14px;
+            text-align: center;
+        ">
+            <b>{map_title}</b><br>{subtitle}
+        </div>
+    """
+    m.get_root().html.add_child(Element(title_html))
+
+    return m.get_root().render()
+
+
+class MapRenderer:
+    """
+    Renders a category's choropleth on first request and keeps at most max_entries
+    of them, least recently used evicted first. Entries are stored already compressed
+    (CompressedBody) so the route never holds a second copy of the html.
+    Concurrent requests for a map that is still rendering wait for that one render.
+    Filtered maps (a CrimeCube filter key) go in a separate LRU of at most max_filtered,
+    keyed by (category, filters), so they never push out the all-time maps.
+    run, if given, executes the render + compression (e.g. WorkerPool.run) while the
+    locking and waiting stay with the caller.
+    """
+
+    def __init__(self, shapes_gdf, nta_counts, cube=None, max_entries=MAX_RENDERED_MAPS,
+                 max_filtered=MAX_FILTERED_MAPS, run=None):
+        self.shapes_gdf = shapes_gdf
+        self.nta_counts = nta_counts
+        self.cube = cube
+        self._run = run
+        self.max_entries = max(1, max_entries)
+        self.max_filtered = max(1, max_filtered)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._filtered = OrderedDict()
+        self._inflight = {}
+
+    @property
+    def categories(self):
+        return list(self.nta_counts.columns)
+
+    def __contains__(self, cat):
+        return cat in self.nta_counts.columns
+
+    def __len__(self):
+        return len(self._entries) + len(self._filtered)
+
+    def get(self, cat, filters=None):
+        """CompressedBody for a category (optionally filtered), rendering it if nobody has yet"""
+        if cat not in self:
+            raise KeyError(cat)
+        if filters is not None and self.cube is None:
+            raise ValueError("Filtered maps need the crime cube")
+        key = (cat, filters)
+
+        while True:
+            with self._lock:
+                entries = self._entries if filters is None else self._filtered
+                entry = entries.get(key)
+                if entry is not None:
+                    entries.move_to_end(key)
+                    return entry
+                done = self._inflight.get(key)
+                owner = done is None
+                if owner:
+                    done = self._inflight[key] = threading.Event()
+
+            if not owner:
+                # someone else is rendering it, wait then re-check (a failed render gets retried)
+                done.wait()
+                continue
+
+            try:
+                if self._run is not None:
+                    entry = self._run(self._render, cat, filters)
+                else:
+                    entry = self._render(cat, filters)
+                self._store(key, entry)
+                return entry
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                done.set()
+
+    def _render(self, cat, filters):
+        """html + compression for one map, touches no locks so it can run on another thread"""
+        with span("folium_render", category=cat, filtered=filters is not None):
+            if filters is None:
+                html = render_choropleth(self.shapes_gdf, self.nta_counts[cat], cat)
+            else:
+                counts = self.cube.query(cat, filters)
+                html = render_choropleth(self.shapes_gdf, counts, cat, describe_filters(filters))
+        with span("map_compress", category=cat):
+            return CompressedBody(html)
+
+    def seed(self, cat, html):
+        """put an already rendered all-time map (e.g. from a snapshot) in the cache"""
+        entry = self._run(CompressedBody, html) if self._run is not None else CompressedBody(html)
+        self._store((cat, None), entry)
+
+    def carry_over(self, previous, categories):
+        """
+        Reuse previous renderer's maps (filtered ones too) for categories whose counts didn't
+        change, e.g. after rows were appended that only touch a few categories.
+        """
+        keep = set(categories)
+        with previous._lock:
+            entries = [
+                (key, entry)
+                for key, entry in [*previous._entries.items(), *previous._filtered.items()]
+                if key[0] in keep
+            ]
+        for key, entry in entries:
+            self._store(key, entry)
+
+    def _store(self, key, entry):
+        entries, limit = (self._entries, self.max_entries) if key[1] is None else (self._filtered, self.max_filtered)
+        with self._lock:
+            entries[key] = entry
+            entries.move_to_end(key)
+            while len(entries) > limit:
+                entries.popitem(last=False)
+
+    def rendered(self):
+        """{category: html} of the all-time maps currently cached, filtered ones aren't worth keeping"""
+        with self._lock:
+            entries = list(self._entries.items())
+        return {cat: entry.encodings["identity"].decode("utf-8") for (cat, _), entry in entries}
+
+    def prewarm(self, order=PREWARM_ORDER):
+        """render categories in priority order on a background thread, stops once the LRU is full"""
+        def warm():
+            for cat in [c for c in order if c in self][:self.max_entries]:
+                try:
+                    self.get(cat)
+                except Exception as e:
+                    print(f"prewarming {cat} map failed: {e}")
+
+        thread = threading.Thread(target=warm, daemon=True)
+        thread.start()
+        return thread
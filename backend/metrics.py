@@ -0,0 +1,188 @@
+#timing spans for the load stages and renders, latency histograms for routes and socket handlers,
+#all rendered as Prometheus text on /metrics. An observation is a perf_counter pair, a bisect and
+#a few adds under a lock, cheap enough to leave on in production
+import bisect
+import os
+import resource
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+try:
+    # spans also close on the cpu pool's native threads, where a monkey patched lock can't be used.
+    # The critical sections never yield so a real lock is fine from greenlets too
+    from gevent.monkey import get_original
+    _allocate_lock = get_original("_thread", "allocate_lock")
+except ImportError:
+    from _thread import allocate_lock as _allocate_lock
+
+# seconds, from a sub millisecond socket handler up to a cold load of the full dataset
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+class Histogram:
+    """cumulative buckets per label set, the same shape prometheus_client exposes"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(float(b) for b in buckets)
+        self._series = {}
+        self._lock = _allocate_lock()
+
+    def observe(self, value, *labelvalues):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                # per bucket counts (plus +Inf), sum
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labelvalues):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labelvalues)
+
+    def render(self):
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labelvalues, counts, total in sorted(series):
+            labels = _labels(self.labelnames, labelvalues)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), labelvalues + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{labels} {total!r}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """a value read when /metrics is scraped, fn returns a number or {label tuple: number}"""
+
+    def __init__(self, name, documentation, fn, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        try:
+            value = self.fn()
+        except Exception:
+            return lines
+        values = value.items() if isinstance(value, dict) else [((), value)]
+        for labelvalues, v in values:
+            if v is not None:
+                lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {float(v)!r}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Prometheus text exposition format 0.0.4"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "camp_stage_seconds", "Duration of data load, derive and render stages.", ["stage"],
+))
+HTTP_SECONDS = REGISTRY.register(Histogram(
+    "camp_http_request_seconds", "HTTP request latency by route and status.", ["route", "status"],
+))
+SOCKET_SECONDS = REGISTRY.register(Histogram(
+    "camp_socket_handler_seconds", "Socket.IO handler latency by event.", ["event"],
+))
+# a healthy loop wakes a sleeper well under a millisecond late, so finer buckets at the bottom
+LOOP_LAG_SECONDS = REGISTRY.register(Histogram(
+    "camp_event_loop_lag_seconds", "How late the event loop wakes a sleeping greenlet.", [],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+))
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def resident_bytes():
+    """RSS of this process, the high water mark where /proc isn't available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+REGISTRY.register(Gauge("camp_process_resident_bytes", "Resident memory of this worker.", resident_bytes))
+
+
+def watch_loop_lag(sleep, interval):
+    """
+    Sleep interval seconds forever and observe how late each wake up is. That lateness is what
+    any socket waits on top of its own work, a blocking call shows up here first. Run it as a
+    background task on the loop being watched.
+    """
+    while True:
+        start = time.perf_counter()
+        sleep(interval)
+        LOOP_LAG_SECONDS.observe(max(time.perf_counter() - start - interval, 0.0))
+
+
+@contextmanager
+def span(stage, **fields):
+    """
+    Time one stage into camp_stage_seconds and log it as a structured line, e.g.
+    `span stage=nta_join ms=812.4 rows=2690000`. fields only go to the log, stage is the label.
+    """
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield fields
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage)
+        extra = "".join(f" {k}={v}" for k, v in fields.items())
+        print(f"span stage={stage} ms={elapsed * 1000:.1f} status={status}{extra}")
+
+
+def timed(histogram, *labelvalues):
+    """decorator version of Histogram.time, for socket handlers"""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with histogram.time(*labelvalues):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
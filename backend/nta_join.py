@@ -0,0 +1,154 @@
+#point in polygon NTA assignment straight from coordinate arrays
+#most points land in a grid cell that sits fully inside one NTA (or outside all of them) and are
+#answered by one array lookup, only points in cells crossing a border get an exact STRtree query
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import shapely
+from shapely import STRtree
+
+# ~200m cells over NYC, small enough that border cells are a few percent of the grid
+DEFAULT_CELL_DEG = 0.002
+CHUNK_SIZE = 500_000
+
+_OUTSIDE = -1
+_BORDER = -2
+
+
+class NTAIndex:
+    """
+    Built once from the NTA shapes, then assign(lon, lat) returns the position of the
+    NTA each point falls in (-1 for none) as an int16 array, matching shapes' row order.
+    """
+
+    def __init__(self, shapes, cell_deg=DEFAULT_CELL_DEG):
+        if shapes.crs is not None and shapes.crs.to_epsg() != 4326:
+            shapes = shapes.to_crs("EPSG:4326")
+        self.geometries = np.asarray(shapes.geometry.values, dtype=object)
+        self.cell_deg = cell_deg
+        self._build()
+
+    def _build(self):
+        self.tree = STRtree(self.geometries)
+
+        min_x, min_y, max_x, max_y = shapely.total_bounds(self.geometries)
+        self.origin = (min_x, min_y)
+        # floor + 1 so a point sitting exactly on the max bound still has a cell
+        self.shape = (
+            int((max_y - min_y) // self.cell_deg) + 1,
+            int((max_x - min_x) // self.cell_deg) + 1,
+        )
+        rows, cols = np.indices(self.shape)
+        cells = shapely.box(
+            min_x + cols.ravel() * self.cell_deg,
+            min_y + rows.ravel() * self.cell_deg,
+            min_x + (cols.ravel() + 1) * self.cell_deg,
+            min_y + (rows.ravel() + 1) * self.cell_deg,
+        )
+
+        grid = np.full(cells.size, _BORDER, dtype=np.int16)
+        touched = np.zeros(cells.size, dtype=bool)
+        touched[self.tree.query(cells, predicate="intersects")[0]] = True
+        grid[~touched] = _OUTSIDE
+
+        cell_idx, poly_idx = self.tree.query(cells, predicate="within")
+        grid[cell_idx] = poly_idx
+        self.grid = grid.reshape(self.shape)
+
+    def __getstate__(self):
+        # STRtree doesn't pickle, worker processes rebuild it from the geometries
+        return {"geometries": self.geometries, "cell_deg": self.cell_deg}
+
+    def __setstate__(self, state):
+        self.geometries = state["geometries"]
+        self.cell_deg = state["cell_deg"]
+        self._build()
+
+    @property
+    def border_fraction(self):
+        return float(np.mean(self.grid == _BORDER))
+
+    def _assign_chunk(self, lon, lat):
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        out = np.full(len(lon), _OUTSIDE, dtype=np.int16)
+
+        with np.errstate(invalid="ignore"):
+            col = np.floor((lon - self.origin[0]) / self.cell_deg)
+            row = np.floor((lat - self.origin[1]) / self.cell_deg)
+        on_grid = (
+            np.isfinite(col) & np.isfinite(row)
+            & (col >= 0) & (col < self.shape[1]) & (row >= 0) & (row < self.shape[0])
+        )
+        idx = np.flatnonzero(on_grid)
+        out[idx] = self.grid[row[idx].astype(np.intp), col[idx].astype(np.intp)]
+
+        border = np.flatnonzero(out == _BORDER)
+        if border.size:
+            out[border] = _OUTSIDE
+            points = shapely.points(lon[border], lat[border])
+            point_idx, poly_idx = self.tree.query(points, predicate="intersects")
+            # a point on a shared edge hits two NTAs, the lower index wins like a stable sjoin would
+            order = np.lexsort((poly_idx, point_idx))
+            point_idx, poly_idx = point_idx[order], poly_idx[order]
+            first = np.ones(len(point_idx), dtype=bool)
+            first[1:] = point_idx[1:] != point_idx[:-1]
+            out[border[point_idx[first]]] = poly_idx[first]
+
+        return out
+
+    def assign(self, lon, lat, chunk_size=CHUNK_SIZE):
+        """NTA position per point, in chunks so the temporaries stay small"""
+        lon = np.asarray(lon)
+        lat = np.asarray(lat)
+        out = np.empty(len(lon), dtype=np.int16)
+        for start in range(0, len(lon), chunk_size):
+            stop = start + chunk_size
+            out[start:stop] = self._assign_chunk(lon[start:stop], lat[start:stop])
+        return out
+
+    def assign_parallel(self, lon, lat, processes=None, chunk_size=CHUNK_SIZE):
+        """same as assign but chunks are spread over worker processes"""
+        lon = np.asarray(lon)
+        lat = np.asarray(lat)
+        processes = processes or os.cpu_count() or 1
+        if processes <= 1 or len(lon) <= chunk_size:
+            return self.assign(lon, lat, chunk_size)
+
+        starts = list(range(0, len(lon), chunk_size))
+        out = np.empty(len(lon), dtype=np.int16)
+        with ProcessPoolExecutor(
+            max_workers=processes, initializer=_init_worker, initargs=(self,)
+        ) as pool:
+            chunks = pool.map(
+                _assign_in_worker,
+                (lon[s:s + chunk_size] for s in starts),
+                (lat[s:s + chunk_size] for s in starts),
+            )
+            for start, codes in zip(starts, chunks):
+                out[start:start + len(codes)] = codes
+        return out
+
+
+def row_nta_codes(df, shapes):
+    """
+    NTA position per row of df (-1 for none) as int16. A prebuilt dataset already names each
+    row's NTA2020 and only needs a lookup, raw rows get joined from their coordinates.
+    """
+    if "NTA2020" in df:
+        return pd.Index(shapes["NTA2020"]).get_indexer(df["NTA2020"]).astype(np.int16)
+    return NTAIndex(shapes).assign(df["Longitude"].to_numpy(), df["Latitude"].to_numpy())
+
+
+_worker_index = None
+
+
+def _init_worker(index):
+    global _worker_index
+    _worker_index = index
+
+
+def _assign_in_worker(lon, lat):
+    return _worker_index._assign_chunk(lon, lat)
@@ -0,0 +1,58 @@
+#one deadline heap for every geoguesser round on this worker, drained by a single background task
+#instead of a greenlet or timer object per room
+import heapq
+import threading
+import time
+
+# longest the loop sleeps, so a round closes at most this late
+TICK_SECONDS = 0.25
+
+
+class RoundScheduler:
+    """
+    schedule() pushes (deadline, room, round) onto a heap, run_forever() pops whatever is due
+    and hands the whole batch to on_expired. Nothing is ever cancelled: a round that finished
+    early is still popped at its deadline and on_expired just finds it is no longer playing,
+    which keeps schedule / pop at O(log n) with no bookkeeping per room.
+    """
+
+    def __init__(self, on_expired, sleep=time.sleep, clock=time.monotonic, tick=TICK_SECONDS):
+        self.on_expired = on_expired
+        self.sleep = sleep
+        self.clock = clock
+        self.tick = tick
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, room_code, round_no, delay):
+        with self._lock:
+            heapq.heappush(self._heap, (self.clock() + delay, room_code, round_no))
+
+    def pop_due(self, now=None):
+        """every (room_code, round_no) whose deadline has passed"""
+        now = now if now is not None else self.clock()
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, room_code, round_no = heapq.heappop(self._heap)
+                due.append((room_code, round_no))
+        return due
+
+    def next_delay(self):
+        with self._lock:
+            if not self._heap:
+                return self.tick
+            return min(self.tick, max(0.0, self._heap[0][0] - self.clock()))
+
+    def run_forever(self):
+        while True:
+            due = self.pop_due()
+            if due:
+                try:
+                    self.on_expired(due)
+                except Exception as e:
+                    print(f"closing {len(due)} expired round(s) failed: {e}")
+            self.sleep(self.next_delay())
@@ -0,0 +1,64 @@
+#round scoring for a whole room in one numpy pass, and the compact leaderboard sent in round_end
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+# guesses further than this score nothing, closer ones scale linearly up to MAX_ROUND_SCORE
+MAX_SCORING_DISTANCE_KM = 50
+MAX_ROUND_SCORE = 1000
+# round_end carries at most this many leaderboard rows, everyone else gets their own row privately
+LEADERBOARD_SIZE = 10
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """great circle distance in km, elementwise over arrays"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def distance_scores(distance_km):
+    """points per guess, NaN (no guess) and anything past MAX_SCORING_DISTANCE_KM score 0"""
+    distance_km = np.asarray(distance_km, dtype=np.float64)
+    raw = MAX_ROUND_SCORE * (1 - distance_km / MAX_SCORING_DISTANCE_KM)
+    scores = np.where(distance_km <= MAX_SCORING_DISTANCE_KM, raw, 0)
+    # int() used to truncate, keep that so scores don't change
+    return np.trunc(np.nan_to_num(scores, nan=0.0)).astype(np.int64)
+
+
+def score_round(actual, guesses):
+    """
+    actual is {"latitude", "longitude"}, guesses a list of {"latitude", "longitude"} or None.
+    Returns (distance_km with NaN for no guess, round score per guess).
+    """
+    n = len(guesses)
+    guess_lat = np.full(n, np.nan)
+    guess_lon = np.full(n, np.nan)
+    for i, guess in enumerate(guesses):
+        if guess is not None:
+            guess_lat[i] = guess["latitude"]
+            guess_lon[i] = guess["longitude"]
+
+    distance = haversine_km(actual["latitude"], actual["longitude"], guess_lat, guess_lon)
+    return distance, distance_scores(distance)
+
+
+def leaderboard_rows(player_ids, guesses, distance, round_scores, totals):
+    """
+    Compact rows [player_id, rank, round_score, total_score, distance_km, guess_lat, guess_lng]
+    ordered by total score, rank is 1 based, distance and guess are None without a guess.
+    Names aren't repeated, clients already have them from player_joined.
+    """
+    order = np.argsort(-np.asarray(totals), kind="stable")
+    rows = []
+    for rank, i in enumerate(order, start=1):
+        guess = guesses[i]
+        rows.append([
+            player_ids[i],
+            rank,
+            int(round_scores[i]),
+            int(totals[i]),
+            None if np.isnan(distance[i]) else round(float(distance[i]), 2),
+            guess["latitude"] if guess is not None else None,
+            guess["longitude"] if guess is not None else None,
+        ])
+    return rows
@@ -0,0 +1,223 @@
+"""
+Offline build of the crime dataset the server loads.
+
+Streams every CSV chunk through pyarrow a block at a time and adds the columns
+the server would otherwise derive on boot:
+    NTA2020     neighborhood from the point in polygon join
+    BoroName    borough of that neighborhood, also the partition key
+    CRIME_BITS  crime category bitmask from crime_categories
+    ZIPCODE     cleaned to a 5 digit string, null when unusable
+Output is a hive partitioned parquet directory (BoroName=<borough>/part-0.parquet)
+where every row group is sorted by NTA2020 then ZIPCODE, plus _summary.json.
+
+    python backend/scripts/build_dataset.py --chunks backend/csv_chunks \
+        --geojson backend/nyc_nta_2020.geojson --out crime_dataset
+
+Upload the directory to gs://<bucket>/crime_dataset/ and run the server with
+PARQUET_FILE_NAME=crime_dataset/ (or LOCAL_PARQUET_PATH=crime_dataset locally).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import geopandas as gpd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from crime_categories import CATEGORY_BITS, classify_descriptions  # noqa: E402
+from data_loader import clean_zip_codes  # noqa: E402
+from nta_join import NTAIndex  # noqa: E402
+
+SOURCE_COLUMNS = ["Latitude", "Longitude", "ZIPCODE", "TYP_DESC"]
+# carried through untouched when the chunks have them
+PASSTHROUGH_COLUMNS = ["INCIDENT_DATE", "INCIDENT_TIME"]
+UNKNOWN_BOROUGH = "Unknown"
+
+OUTPUT_SCHEMA = pa.schema([
+    ("Latitude", pa.float32()),
+    ("Longitude", pa.float32()),
+    ("ZIPCODE", pa.string()),
+    ("TYP_DESC", pa.string()),
+    ("CRIME_BITS", pa.uint16()),
+    ("NTA2020", pa.string()),
+    *[(name, pa.string()) for name in PASSTHROUGH_COLUMNS],
+])
+
+
+def classify_batch(typ_desc):
+    """category bits per row, the keyword rules only see this batch's distinct descriptions"""
+    encoded = pc.dictionary_encode(typ_desc)
+    desc_bits = classify_descriptions(encoded.dictionary.to_pylist())
+    codes = encoded.indices.to_numpy(zero_copy_only=False)
+    valid = ~np.asarray(encoded.indices.is_null())
+    bits = np.zeros(len(encoded), dtype=np.uint16)
+    bits[valid] = desc_bits[codes[valid].astype(np.int64)]
+    return pa.array(bits, type=pa.uint16())
+
+
+def assign_nta(lat, lon, shapes, nta_index):
+    """NTA2020 and BoroName per point, null where a point is missing or outside every NTA"""
+    lat = lat.to_numpy(zero_copy_only=False)
+    lon = lon.to_numpy(zero_copy_only=False)
+    codes = nta_index.assign(lon, lat)
+    # code -1 picks the null appended at the end of each lookup table
+    lookup = np.where(codes >= 0, codes, len(shapes))
+    return (
+        pa.array(list(shapes["NTA2020"]) + [None], type=pa.string()).take(pa.array(lookup)),
+        pa.array(list(shapes["BoroName"]) + [None], type=pa.string()).take(pa.array(lookup)),
+    )
+
+
+def derive_batch(batch, shapes, nta_index):
+    """source record batch -> (output table, borough per row)"""
+    lat = pc.cast(batch.column("Latitude"), pa.float64())
+    lon = pc.cast(batch.column("Longitude"), pa.float64())
+    nta, boro = assign_nta(lat, lon, shapes, nta_index)
+
+    columns = {
+        "Latitude": pc.cast(lat, pa.float32()),
+        "Longitude": pc.cast(lon, pa.float32()),
+        "ZIPCODE": clean_zip_codes(batch.column("ZIPCODE")),
+        "TYP_DESC": pc.cast(batch.column("TYP_DESC"), pa.string()),
+        "CRIME_BITS": classify_batch(batch.column("TYP_DESC")),
+        "NTA2020": nta,
+    }
+    for name in PASSTHROUGH_COLUMNS:
+        if name in batch.schema.names:
+            columns[name] = pc.cast(batch.column(name), pa.string())
+        else:
+            columns[name] = pa.nulls(len(batch), pa.string())
+
+    table = pa.Table.from_pydict(columns, schema=OUTPUT_SCHEMA)
+    return table, pc.fill_null(boro, UNKNOWN_BOROUGH)
+
+
+class PartitionWriters:
+    """one open ParquetWriter per borough, every write becomes sorted row groups"""
+
+    def __init__(self, out_dir, row_group_size):
+        self.out_dir = out_dir
+        self.row_group_size = row_group_size
+        self.writers = {}
+
+    def write(self, table, boroughs):
+        for borough in pc.unique(boroughs).to_pylist():
+            part = table.filter(pc.equal(boroughs, borough))
+            order = pc.sort_indices(part, sort_keys=[("NTA2020", "ascending"), ("ZIPCODE", "ascending")])
+            part = part.take(order)
+
+            if borough not in self.writers:
+                part_dir = os.path.join(self.out_dir, f"BoroName={borough}")
+                os.makedirs(part_dir, exist_ok=True)
+                self.writers[borough] = pq.ParquetWriter(
+                    os.path.join(part_dir, "part-0.parquet"), OUTPUT_SCHEMA, compression="snappy"
+                )
+            self.writers[borough].write_table(part, row_group_size=self.row_group_size)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+
+def iter_chunk_batches(chunk_files, block_size):
+    """record batches from every CSV, only ever one block of one file in memory"""
+    convert_options = pacsv.ConvertOptions(
+        include_columns=SOURCE_COLUMNS + PASSTHROUGH_COLUMNS,
+        include_missing_columns=True,
+        # chunks don't agree on ZIPCODE's type, read it as text and clean it ourselves
+        column_types={"ZIPCODE": pa.string(), "TYP_DESC": pa.string(),
+                      **{name: pa.string() for name in PASSTHROUGH_COLUMNS}},
+    )
+    for path in chunk_files:
+        reader = pacsv.open_csv(
+            path,
+            read_options=pacsv.ReadOptions(block_size=block_size),
+            convert_options=convert_options,
+        )
+        for batch in reader:
+            yield batch
+
+
+def build(chunks_dir, geojson_path, out_dir, block_size=64 << 20, row_group_size=128_000):
+    started = time.time()
+    chunk_files = sorted(
+        os.path.join(chunks_dir, f) for f in os.listdir(chunks_dir) if f.endswith(".csv")
+    )
+    if not chunk_files:
+        raise SystemExit(f"no .csv chunks in {chunks_dir}")
+    if os.path.exists(out_dir) and os.listdir(out_dir):
+        raise SystemExit(f"{out_dir} already exists and is not empty")
+
+    shapes = gpd.read_file(geojson_path)[["NTA2020", "BoroName", "geometry"]].to_crs("EPSG:4326")
+    nta_index = NTAIndex(shapes)
+
+    summary = {
+        "chunks": len(chunk_files),
+        "rows": 0,
+        "rows_without_coordinates": 0,
+        "rows_outside_nta": 0,
+        "rows_without_zip": 0,
+        "rows_per_borough": {},
+        "rows_per_category": {cat: 0 for cat in CATEGORY_BITS},
+    }
+    ntas = set()
+    zips = set()
+
+    writers = PartitionWriters(out_dir, row_group_size)
+    try:
+        for batch in iter_chunk_batches(chunk_files, block_size):
+            table, boroughs = derive_batch(batch, shapes, nta_index)
+            writers.write(table, boroughs)
+
+            summary["rows"] += table.num_rows
+            no_coords = pc.or_(pc.is_null(table.column("Latitude")), pc.is_null(table.column("Longitude")))
+            summary["rows_without_coordinates"] += pc.sum(no_coords).as_py() or 0
+            summary["rows_outside_nta"] += table.column("NTA2020").null_count
+            summary["rows_without_zip"] += table.column("ZIPCODE").null_count
+            for item in pc.value_counts(boroughs).to_pylist():
+                summary["rows_per_borough"][item["values"]] = summary["rows_per_borough"].get(item["values"], 0) + item["counts"]
+            bits = table.column("CRIME_BITS").to_numpy()
+            for cat, bit in CATEGORY_BITS.items():
+                summary["rows_per_category"][cat] += int(np.count_nonzero(bits & bit))
+            ntas.update(v for v in pc.unique(table.column("NTA2020")).to_pylist() if v is not None)
+            zips.update(v for v in pc.unique(table.column("ZIPCODE")).to_pylist() if v is not None)
+
+            print(f"  {summary['rows']:,} rows processed", end="\r", flush=True)
+    finally:
+        writers.close()
+
+    summary["distinct_nta"] = len(ntas)
+    summary["distinct_zip"] = len(zips)
+    summary["partitions"] = sorted(writers.writers)
+    summary["seconds"] = round(time.time() - started, 1)
+
+    with open(os.path.join(out_dir, "_summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the derived crime dataset from CSV chunks")
+    parser.add_argument("--chunks", default="backend/csv_chunks", help="folder of CSV chunks")
+    parser.add_argument("--geojson", default="backend/nyc_nta_2020.geojson", help="NTA 2020 boundaries")
+    parser.add_argument("--out", default="crime_dataset", help="output directory")
+    parser.add_argument("--block-size-mb", type=int, default=64, help="CSV bytes read per batch")
+    parser.add_argument("--row-group-size", type=int, default=128_000)
+    args = parser.parse_args(argv)
+
+    summary = build(
+        args.chunks, args.geojson, args.out,
+        block_size=args.block_size_mb << 20, row_group_size=args.row_group_size,
+    )
+    print(f"✓ Built {summary['rows']:,} rows from {summary['chunks']} chunks in {summary['seconds']}s")
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
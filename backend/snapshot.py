@@ -0,0 +1,262 @@
+#versioned snapshot of everything making_heatmap derives, so a cold start is a few np.load calls
+#layout of one snapshot directory:
+#   manifest.json          format version, source fingerprints, row count
+#   <column>.npy           one array per row column, memory mapped on load
+#   <column>.values.npy    categories for the categorical columns
+#   nta_ids.npy            NTA2020 id for every NTA_CODE
+#   nta_counts.npy         NTA x map category counts
+#   cube_counts.npy / cube_months.npy / nta_boroughs.npy   the month x hour crime cube
+#   zip_codes.npy / zip_counts.npy   the ZIP crime index
+#   maps/<category>.html   rendered choropleths
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from crime_cube import CrimeCube
+
+# bump whenever the layout or the meaning of a derived column changes
+# (3: ZIPCODE always cleaned to 5 digit text, older ones may hold 10001.0)
+SNAPSHOT_VERSION = 3
+MANIFEST_NAME = "manifest.json"
+
+ROW_COLUMNS = ["Latitude", "Longitude", "ZIPCODE", "TYP_DESC", "CRIME_BITS", "NTA_CODE"]
+CATEGORICAL_COLUMNS = ["ZIPCODE", "TYP_DESC"]
+
+
+def file_fingerprint(path, chunk_size=1 << 20):
+    """sha256 of a local file, or of every file under a partitioned dataset directory"""
+    if os.path.isdir(path):
+        paths = sorted(
+            os.path.join(dirpath, name)
+            for dirpath, _, filenames in os.walk(path)
+            for name in filenames
+            if not name.startswith((".", "_"))
+        )
+    else:
+        paths = [path]
+
+    digest = hashlib.sha256()
+    for file_path in paths:
+        digest.update(os.path.relpath(file_path, path).encode())
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def blob_fingerprint(bucket, blob_name):
+    """GCS already knows the content hash, no need to download anything"""
+    if blob_name.endswith("/"):
+        parts = sorted(
+            f"{blob.name}:{blob.md5_hash}:{blob.generation}"
+            for blob in bucket.list_blobs(prefix=blob_name)
+        )
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    blob = bucket.blob(blob_name)
+    blob.reload()
+    return f"{blob.md5_hash}:{blob.generation}"
+
+
+def snapshot_key(*fingerprints):
+    """a snapshot is only valid for the exact sources and layout it was built from"""
+    digest = hashlib.sha256(f"v{SNAPSHOT_VERSION}".encode())
+    for fingerprint in fingerprints:
+        digest.update(b"\0" + str(fingerprint).encode())
+    return digest.hexdigest()[:16]
+
+
+def _save_array(directory, name, values):
+    values = np.asarray(values)
+    if values.dtype == object:
+        values = values.astype(str)
+    np.save(os.path.join(directory, f"{name}.npy"), values, allow_pickle=False)
+
+
+def _load_array(directory, name):
+    return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r", allow_pickle=False)
+
+
+def save_snapshot(root, key, df, nta_ids, nta_counts, zip_index, maps, cube, sources=None):
+    """
+    Write a snapshot under root/key. df needs every column in ROW_COLUMNS,
+    nta_counts is a DataFrame indexed like nta_ids with one column per map category,
+    cube is the CrimeCube built over the same NTAs and categories.
+    Written to a temp dir and renamed so a reader never sees half a snapshot.
+    """
+    os.makedirs(root, exist_ok=True)
+    final_dir = os.path.join(root, key)
+    tmp_dir = tempfile.mkdtemp(dir=root, prefix=f".{key}-")
+
+    try:
+        for column in ROW_COLUMNS:
+            if column in CATEGORICAL_COLUMNS:
+                _save_array(tmp_dir, column, df[column].cat.codes.to_numpy())
+                _save_array(tmp_dir, f"{column}.values", df[column].cat.categories.to_numpy())
+            else:
+                _save_array(tmp_dir, column, df[column].to_numpy())
+
+        _save_array(tmp_dir, "nta_ids", nta_ids)
+        _save_array(tmp_dir, "nta_counts", nta_counts.to_numpy(dtype=np.int64))
+        _save_array(tmp_dir, "nta_boroughs", cube.nta_boroughs)
+        _save_array(tmp_dir, "cube_counts", cube.counts)
+        _save_array(tmp_dir, "cube_months", np.array(cube.months, dtype=str))
+
+        zip_codes = list(zip_index)
+        _save_array(tmp_dir, "zip_codes", zip_codes)
+        _save_array(
+            tmp_dir,
+            "zip_counts",
+            np.array([zip_index[z] for z in zip_codes], dtype=np.int64).reshape(len(zip_codes), -1),
+        )
+
+        os.makedirs(os.path.join(tmp_dir, "maps"))
+        for cat, html in maps.items():
+            with open(os.path.join(tmp_dir, "maps", f"{cat}.html"), "w", encoding="utf-8") as f:
+                f.write(html)
+
+        manifest = {
+            "version": SNAPSHOT_VERSION,
+            "key": key,
+            "rows": len(df),
+            "created": time.time(),
+            "sources": sources or {},
+            "categories": list(nta_counts.columns),
+            "maps": list(maps),
+        }
+        with open(os.path.join(tmp_dir, MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        if os.path.exists(final_dir):
+            shutil.rmtree(final_dir)
+        os.replace(tmp_dir, final_dir)
+    finally:
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+
+    return final_dir
+
+
+def prune_snapshots(root, keep):
+    """
+    Delete every snapshot under root but keep. On Cloud Run root is in memory, so each stale
+    snapshot left behind costs as much RAM as the row arrays it holds.
+    A dataset still mapping a deleted snapshot keeps its pages until it's dropped.
+    """
+    if not os.path.isdir(root):
+        return
+    for name in os.listdir(root):
+        # dot dirs are saves or downloads still being written
+        if name == keep or name.startswith("."):
+            continue
+        path = os.path.join(root, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def load_snapshot(root, key):
+    """
+    Memory map a snapshot, returns None if it is missing or from another version.
+    Row arrays stay on disk until touched, so this returns in well under a second.
+    """
+    directory = os.path.join(root, key)
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != SNAPSHOT_VERSION or manifest.get("key") != key:
+        return None
+
+    columns = {}
+    for column in ROW_COLUMNS:
+        if column in CATEGORICAL_COLUMNS:
+            columns[column] = pd.Categorical.from_codes(
+                _load_array(directory, column),
+                categories=np.asarray(_load_array(directory, f"{column}.values")),
+            )
+        else:
+            columns[column] = _load_array(directory, column)
+    # copy=False keeps the plain columns as views onto the memory mapped files
+    df = pd.DataFrame(columns, copy=False)
+
+    nta_ids = np.asarray(_load_array(directory, "nta_ids"))
+    nta_counts = pd.DataFrame(
+        np.asarray(_load_array(directory, "nta_counts")),
+        index=pd.Index(nta_ids, name="NTA2020"),
+        columns=manifest["categories"],
+    )
+    # summed over on every filtered query, worth having in memory rather than mapped
+    cube = CrimeCube(
+        np.load(os.path.join(directory, "cube_counts.npy"), allow_pickle=False),
+        [str(m) for m in _load_array(directory, "cube_months")],
+        nta_ids,
+        np.asarray(_load_array(directory, "nta_boroughs")),
+        manifest["categories"],
+    )
+
+    zip_codes = np.asarray(_load_array(directory, "zip_codes"))
+    zip_counts = np.asarray(_load_array(directory, "zip_counts"))
+    zip_index = {z.item(): zip_counts[i] for i, z in enumerate(zip_codes)}
+
+    maps = {}
+    for cat in manifest["maps"]:
+        with open(os.path.join(directory, "maps", f"{cat}.html"), encoding="utf-8") as f:
+            maps[cat] = f.read()
+
+    return {
+        "manifest": manifest,
+        "df": df,
+        "nta_ids": nta_ids,
+        "nta_counts": nta_counts,
+        "zip_index": zip_index,
+        "maps": maps,
+        "cube": cube,
+    }
+
+
+def upload_snapshot(bucket, root, key, prefix="snapshots"):
+    """copy a local snapshot to GCS so fresh instances can skip the rebuild"""
+    directory = os.path.join(root, key)
+    for dirpath, _, filenames in os.walk(directory):
+        for filename in filenames:
+            # manifest goes last, its presence is what marks the snapshot complete
+            if filename == MANIFEST_NAME and dirpath == directory:
+                continue
+            path = os.path.join(dirpath, filename)
+            rel = os.path.relpath(path, directory).replace(os.sep, "/")
+            bucket.blob(f"{prefix}/{key}/{rel}").upload_from_filename(path)
+    bucket.blob(f"{prefix}/{key}/{MANIFEST_NAME}").upload_from_filename(
+        os.path.join(directory, MANIFEST_NAME)
+    )
+
+
+def download_snapshot(bucket, root, key, prefix="snapshots"):
+    """fetch a snapshot from GCS into root/key, returns False if there isn't a complete one"""
+    if not bucket.blob(f"{prefix}/{key}/{MANIFEST_NAME}").exists():
+        return False
+
+    os.makedirs(root, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=root, prefix=f".{key}-")
+    try:
+        for blob in bucket.list_blobs(prefix=f"{prefix}/{key}/"):
+            rel = blob.name[len(f"{prefix}/{key}/"):]
+            path = os.path.join(tmp_dir, *rel.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            blob.download_to_filename(path)
+
+        final_dir = os.path.join(root, key)
+        if os.path.exists(final_dir):
+            shutil.rmtree(final_dir)
+        os.replace(tmp_dir, final_dir)
+    finally:
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+    return True
@@ -0,0 +1,232 @@
+#"what happened near here": radius and bounding box queries over every crime coordinate. Rows are
+#bucketed into ~500m grid cells and an offset index over the cell sorted row order finds the rows of
+#any block of cells as one contiguous run per cell row, so a query only looks at the rows around it
+import numpy as np
+
+from crime_categories import CATEGORY_BITS, MAP_CATEGORIES
+from location_sampler import NYC_BOUNDS
+from scoring import haversine_km
+
+# cell height in degrees of latitude (~555m), widths are scaled so cells are about square
+CELL_DEG = 0.005
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+# big enough for a neighborhood or a borough, small enough that a query stays in milliseconds
+MAX_RADIUS_M = 5000
+MAX_BBOX_DEG = 0.25
+
+
+class SpatialIndex:
+    """
+    Built once per Dataset over its resident frame. Keeps only the cell sorted row order and the
+    cell offsets, coordinates and descriptions are read from the frame's own columns per query.
+    Rows outside NYC_BOUNDS (geocoding mistakes) aren't indexed.
+    """
+
+    def __init__(self, lat, lon, bits, desc_codes, desc_labels, zip_codes, zip_labels,
+                 origin, cell_lon, width, order, offsets):
+        self.lat = lat
+        self.lon = lon
+        self.bits = bits
+        self.desc_codes = desc_codes
+        self.desc_labels = desc_labels
+        self.zip_codes = zip_codes
+        self.zip_labels = zip_labels
+        self.origin = origin
+        self.cell_lon = cell_lon
+        self.width = width
+        self.order = order
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, df):
+        """df needs Latitude, Longitude, CRIME_BITS and categorical TYP_DESC / ZIPCODE, as resident_frame leaves it"""
+        lat = df["Latitude"].to_numpy()
+        lon = df["Longitude"].to_numpy()
+        keep = np.flatnonzero(
+            (lat >= NYC_BOUNDS["lat"][0]) & (lat <= NYC_BOUNDS["lat"][1])
+            & (lon >= NYC_BOUNDS["lon"][0]) & (lon <= NYC_BOUNDS["lon"][1])
+        )
+
+        origin = (NYC_BOUNDS["lat"][0], NYC_BOUNDS["lon"][0])
+        cell_lon = CELL_DEG / np.cos(np.radians(np.mean(NYC_BOUNDS["lat"])))
+        width = int(np.ceil((NYC_BOUNDS["lon"][1] - origin[1]) / cell_lon)) + 1
+        height = int(np.ceil((NYC_BOUNDS["lat"][1] - origin[0]) / CELL_DEG)) + 1
+        cell = _cells(lat[keep], lon[keep], origin, cell_lon, width, height)
+
+        # row positions grouped by cell, offsets[cell] is where each cell's rows start
+        order = keep[np.argsort(cell, kind="stable")].astype(np.int32)
+        offsets = np.zeros(width * height + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cell, minlength=width * height), out=offsets[1:])
+
+        desc, zips = _categorical(df["TYP_DESC"]), _categorical(df["ZIPCODE"])
+        return cls(
+            lat, lon, df["CRIME_BITS"].to_numpy(),
+            desc.cat.codes.to_numpy(), [str(d) for d in desc.cat.categories],
+            zips.cat.codes.to_numpy(), [str(z) for z in zips.cat.categories],
+            origin, cell_lon, width, order, offsets,
+        )
+
+    def __len__(self):
+        return len(self.order)
+
+    def radius(self, lat, lon, radius_m, category=None, limit=DEFAULT_LIMIT):
+        """
+        Incidents within radius_m of (lat, lon): counts per map category, the total (all 911
+        calls, not just the categorised ones) and the nearest limit incidents, of category if given
+        """
+        # the circle's bounding box, one degree of longitude shrinks with cos(lat)
+        dlat = radius_m / 111_320
+        dlon = dlat / max(np.cos(np.radians(lat)), 1e-6)
+        rows = self._candidates(lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+        distance_m = haversine_km(lat, lon, self.lat[rows], self.lon[rows]) * 1000
+        inside = distance_m <= radius_m
+        rows, distance_m = rows[inside], distance_m[inside]
+
+        sample = self._category_rows(rows, category)
+        if len(sample) > limit:
+            nearest = np.argpartition(distance_m[sample], limit)[:limit]
+            sample = sample[nearest]
+        sample = sample[np.argsort(distance_m[sample], kind="stable")]
+
+        result = self._summary(rows, sample, distance_m)
+        result["query"] = {"latitude": lat, "longitude": lon, "radius_m": radius_m, "category": category}
+        return result
+
+    def bbox(self, south, west, north, east, category=None, limit=DEFAULT_LIMIT):
+        """Incidents inside the box, like radius() but the sample is spread evenly over the matches"""
+        rows = self._candidates(south, west, north, east)
+        lat, lon = self.lat[rows], self.lon[rows]
+        rows = rows[(lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)]
+
+        sample = self._category_rows(rows, category)
+        if len(sample) > limit:
+            sample = sample[np.linspace(0, len(sample) - 1, limit).astype(np.int64)]
+
+        result = self._summary(rows, sample)
+        result["query"] = {"bbox": [west, south, east, north], "category": category}
+        return result
+
+    def _candidates(self, south, west, north, east):
+        """row positions of every cell the box touches, a superset the caller filters exactly"""
+        height = (len(self.offsets) - 1) // self.width
+        r0, c0 = self._cell(south, west)
+        r1, c1 = self._cell(north, east)
+        r0, r1 = max(r0, 0), min(r1, height - 1)
+        c0, c1 = max(c0, 0), min(c1, self.width - 1)
+        if r0 > r1 or c0 > c1:
+            return np.empty(0, dtype=np.int64)
+
+        # each cell row of the block is one run of the sorted order
+        row_starts = np.arange(r0, r1 + 1) * self.width
+        starts, ends = self.offsets[row_starts + c0], self.offsets[row_starts + c1 + 1]
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64)
+        before = np.cumsum(lengths) - lengths
+        positions = np.repeat(starts - before, lengths) + np.arange(total)
+        return self.order[positions].astype(np.int64)
+
+    def _cell(self, lat, lon):
+        return (int(np.floor((lat - self.origin[0]) / CELL_DEG)),
+                int(np.floor((lon - self.origin[1]) / self.cell_lon)))
+
+    def _category_rows(self, rows, category):
+        """positions into rows that are of category, all of them without one"""
+        if category is None:
+            return np.arange(len(rows))
+        return np.flatnonzero((self.bits[rows] & CATEGORY_BITS[category]) != 0)
+
+    def _summary(self, rows, sample, distance_m=None):
+        bits = self.bits[rows]
+        counts = {cat: int(np.count_nonzero(bits & CATEGORY_BITS[cat])) for cat in MAP_CATEGORIES}
+        return {
+            "total": len(rows),
+            "counts": counts,
+            "incidents": [self._incident(rows[i], None if distance_m is None else distance_m[i]) for i in sample],
+        }
+
+    def _incident(self, row, distance_m=None):
+        desc, zip_code, bits = self.desc_codes[row], self.zip_codes[row], int(self.bits[row])
+        incident = {
+            "latitude": round(float(self.lat[row]), 6),
+            "longitude": round(float(self.lon[row]), 6),
+            "description": self.desc_labels[desc] if desc >= 0 else None,
+            "zip_code": self.zip_labels[zip_code] if zip_code >= 0 else None,
+            "categories": [cat for cat in MAP_CATEGORIES if bits & CATEGORY_BITS[cat]],
+        }
+        if distance_m is not None:
+            incident["distance_m"] = round(float(distance_m), 1)
+        return incident
+
+
+def _cells(lat, lon, origin, cell_lon, width, height):
+    rows = np.clip(np.floor((lat - origin[0]) / CELL_DEG).astype(np.int64), 0, height - 1)
+    cols = np.clip(np.floor((lon - origin[1]) / cell_lon).astype(np.int64), 0, width - 1)
+    return rows * width + cols
+
+
+def _categorical(column):
+    return column if hasattr(column, "cat") else column.astype("category")
+
+
+def parse_query(args):
+    """
+    (category, limit) from ?category=&limit=, shared by both query kinds.
+    Raises ValueError with a message fit for a 400.
+    """
+    category = (args.get("category") or "").strip().upper() or None
+    if category is not None and category not in MAP_CATEGORIES:
+        raise ValueError(f"Invalid category: {category}")
+    limit = _number(args, "limit", DEFAULT_LIMIT, int)
+    if not 0 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit must be between 0 and {MAX_LIMIT}")
+    return category, limit
+
+
+def parse_radius(args):
+    """(lat, lon, radius_m) from ?lat=&lon=&radius=, radius in metres"""
+    lat = _number(args, "lat")
+    lon = _number(args, "lon")
+    radius_m = _number(args, "radius", 500.0)
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("lat / lon out of range")
+    if not 0 < radius_m <= MAX_RADIUS_M:
+        raise ValueError(f"radius must be between 0 and {MAX_RADIUS_M} metres")
+    return lat, lon, radius_m
+
+
+def parse_bbox(args):
+    """(south, west, north, east) from ?bbox=west,south,east,north, the GeoJSON / OSM order"""
+    try:
+        west, south, east, north = (float(v) for v in (args.get("bbox") or "").split(","))
+    except ValueError:
+        raise ValueError("bbox must be west,south,east,north") from None
+    if not (-180 <= west <= 180 and -180 <= east <= 180 and -90 <= south <= 90 and -90 <= north <= 90):
+        raise ValueError("bbox out of range, must be west,south,east,north")
+    if not (west < east and south < north):
+        raise ValueError("bbox must be west,south,east,north")
+    if east - west > MAX_BBOX_DEG or north - south > MAX_BBOX_DEG:
+        raise ValueError(f"bbox can span at most {MAX_BBOX_DEG} degrees each way")
+    # a lat first box (south,west,north,east) around NYC is in range and orders fine, but lands
+    # nowhere near it, so say so rather than answer total 0
+    if (east < NYC_BOUNDS["lon"][0] or west > NYC_BOUNDS["lon"][1]
+            or north < NYC_BOUNDS["lat"][0] or south > NYC_BOUNDS["lat"][1]):
+        raise ValueError("bbox is outside NYC, must be west,south,east,north")
+    return south, west, north, east
+
+
+def _number(args, name, default=None, kind=float):
+    value = (args.get(name) or "").strip()
+    if not value:
+        if default is None:
+            raise ValueError(f"Missing {name}")
+        return default
+    try:
+        number = kind(value)
+    except ValueError:
+        raise ValueError(f"Invalid {name}: {value}") from None
+    if not np.isfinite(number):
+        raise ValueError(f"Invalid {name}: {value}")
+    return number
@@ -0,0 +1,19 @@
+import pytest
+
+from spatial_index import parse_bbox
+
+
+def test_parse_bbox_reads_west_south_east_north():
+    assert parse_bbox({"bbox": "-74.0,40.7,-73.9,40.8"}) == (40.7, -74.0, 40.8, -73.9)
+
+
+def test_parse_bbox_rejects_lat_first_order():
+    # in range, orders fine and spans 0.1 degrees each way, but it's nowhere near NYC
+    with pytest.raises(ValueError, match="outside NYC"):
+        parse_bbox({"bbox": "40.7,-74.0,40.8,-73.9"})
+
+
+@pytest.mark.parametrize("bbox", ["-181,40.7,-73.9,40.8", "-74.0,-91,-73.9,40.8", "-74.0,40.7,-73.9,91"])
+def test_parse_bbox_rejects_out_of_range(bbox):
+    with pytest.raises(ValueError, match="out of range"):
+        parse_bbox({"bbox": bbox})
@@ -0,0 +1,58 @@
+#CPU heavy work (parquet loads, NTA joins, folium renders) on native OS threads so the gevent
+#loop keeps answering sockets. Under gunicorn's gevent worker threading is monkey patched and a
+#"thread" is really a greenlet that holds the loop until it finishes, these are real threads
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import gevent
+    from gevent import monkey
+    from gevent.threadpool import ThreadPool as GeventThreadPool
+except ImportError:  # plain threads are already off the (nonexistent) loop
+    gevent = None
+
+CPU_POOL_SIZE = int(os.getenv("CPU_POOL_SIZE", str(max(2, os.cpu_count() or 2))))
+
+
+def _loop_is_gevent():
+    return gevent is not None and monkey.is_module_patched("threading")
+
+
+class WorkerPool:
+    """
+    run(fn, *args) executes fn on a native thread and returns its result (or raises its
+    exception) in the caller. Only the calling greenlet waits, every other socket keeps
+    being served. numpy / pandas / GEOS drop the GIL for most of their work, and pure Python
+    work like folium still gets preempted every few ms instead of owning the loop.
+
+    fn must not touch gevent primitives (monkey patched locks, events, sockets), keep the
+    locking on the greenlet side and only send the pure computation here.
+    """
+
+    def __init__(self, size=CPU_POOL_SIZE):
+        self.size = size
+        self._gevent_pool = None
+        self._executor = None
+
+    @property
+    def uses_gevent(self):
+        return _loop_is_gevent()
+
+    def run(self, fn, *args, **kwargs):
+        if self.uses_gevent:
+            if self._gevent_pool is None:
+                self._gevent_pool = GeventThreadPool(self.size)
+            # blocks this greenlet only, the hub is woken through an async watcher when fn returns
+            return self._gevent_pool.apply(fn, args, kwargs)
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="cpu")
+        return self._executor.submit(fn, *args, **kwargs).result()
+
+    def close(self):
+        if self._gevent_pool is not None:
+            self._gevent_pool.kill()
+            self._gevent_pool = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
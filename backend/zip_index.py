@@ -0,0 +1,63 @@
+#ZIP x crime type count table so a geoguesser round is a dict lookup instead of ~15 regex scans over df
+import numpy as np
+import pandas as pd
+
+from crime_categories import CHART_CATEGORIES, CATEGORY_BITS, classify_rows
+
+CRIME_TYPES = list(CHART_CATEGORIES)
+_CHART_BITS = np.array([CATEGORY_BITS[cat] for cat in CHART_CATEGORIES.values()])
+
+
+def build_zip_crime_index(df):
+    """
+    Count every crime type for every ZIP code in one pass.
+    Returns {zip_code: np.array of counts in CRIME_TYPES order}.
+    """
+    if df is None or df.empty:
+        return {}
+
+    bits = df["CRIME_BITS"] if "CRIME_BITS" in df else classify_rows(df["TYP_DESC"])
+
+    # rows collapse to (zip, category bits) pairs, there are only a handful of distinct bit patterns
+    pair_counts = (
+        pd.DataFrame({"ZIPCODE": df["ZIPCODE"].to_numpy(), "CRIME_BITS": np.asarray(bits)})
+        .groupby(["ZIPCODE", "CRIME_BITS"], observed=True, sort=False)
+        .size()
+    )
+    if pair_counts.empty:
+        return {}
+
+    zips = pair_counts.index.get_level_values("ZIPCODE")
+    pair_bits = pair_counts.index.get_level_values("CRIME_BITS").to_numpy()
+
+    matched = (pair_bits[:, None] & _CHART_BITS[None, :]) != 0
+    weighted = matched * pair_counts.to_numpy()[:, None]
+
+    zip_codes, distinct_zips = pd.factorize(zips)
+    totals = np.zeros((len(distinct_zips), len(CRIME_TYPES)), dtype=np.int64)
+    np.add.at(totals, zip_codes, weighted)
+
+    return {zip_code: totals[i] for i, zip_code in enumerate(distinct_zips)}
+
+
+def compact_zip_crime_counts(index, zip_code):
+    """
+    [position in CRIME_TYPES, count] pairs for a ZIP, zero counts dropped. What a round sends,
+    clients get the names and colors once at connect.
+    """
+    counts = index.get(zip_code)
+    if counts is None:
+        return []
+    return [[i, int(n)] for i, n in enumerate(counts) if n > 0]
+
+
+def update_zip_crime_index(index, new_rows):
+    """
+    Fold newly arrived rows into an existing index without rescanning old data.
+    Entries are replaced, never mutated, so readers never see a half added row.
+    """
+    delta = build_zip_crime_index(new_rows)
+    for zip_code, counts in delta.items():
+        existing = index.get(zip_code)
+        index[zip_code] = counts if existing is None else existing + counts
+    return index
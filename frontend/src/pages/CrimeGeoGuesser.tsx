@@ -33,11 +33,21 @@ const CrimeGeoGuesser = () => {
   const [imageError, setImageError] = useState(false);
   const [crimeStats, setCrimeStats] = useState([]);
   const [zipCode, setZipCode] = useState('');
+  const [roomSize, setRoomSize] = useState(2);
+  const [maxPlayers, setMaxPlayers] = useState(2);
+  const [playerCount, setPlayerCount] = useState(0);
+  const [myResult, setMyResult] = useState(null);
+  const [nearby, setNearby] = useState(null);
 
   const mapRef = useRef<HTMLDivElement | null>(null);
   const mapInstanceRef = useRef<any>(null);
   const markerRef = useRef<any>(null);
   const wsRef = useRef<WebSocket | null>(null);
+  // the socket handler is created once, it reads these instead of stale state
+  const playersRef = useRef({});
+  const playerIdRef = useRef('');
+  // crime type names and colors, sent once on connect, rounds only carry [type index, count]
+  const chartLookupsRef = useRef({ crime_types: [], crime_colors: [] });
 
   useEffect(() => {
     if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
@@ -109,6 +119,16 @@ const CrimeGeoGuesser = () => {
     };
   }, []);
 
+  const toResult = ([player_id, rank, round_score, total_score, distance_km, lat, lng]) => ({
+    player_id,
+    rank,
+    player_name: playersRef.current[player_id]?.name ?? 'Player',
+    round_score,
+    total_score,
+    distance_km,
+    guess: lat === null ? null : { latitude: lat, longitude: lng },
+  });
+
   const sendSocketEvent = (eventName, data) => {
     console.log('Attempting to send event:', eventName, data);
     if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
@@ -127,11 +147,14 @@ const CrimeGeoGuesser = () => {
     switch(eventName) {
       case 'connected':
         console.log('Server acknowledged connection');
+        chartLookupsRef.current = { crime_types: data.crime_types || [], crime_colors: data.crime_colors || [] };
         break;
 
       case 'room_created':
         setRoomCode(data.room_code);
         setPlayerId(data.player_id);
+        playerIdRef.current = data.player_id;
+        setMaxPlayers(data.max_players || 2);
         setGameState('lobby');
         setError('');
         break;
@@ -139,12 +162,16 @@ const CrimeGeoGuesser = () => {
       case 'room_joined':
         setRoomCode(data.room_code);
         setPlayerId(data.player_id);
+        playerIdRef.current = data.player_id;
+        setMaxPlayers(data.max_players || 2);
         setGameState('lobby');
         setError('');
         break;
 
       case 'player_joined':
-        setPlayers(data.players);
+        // the full list when we join, only the newcomer after that
+        playersRef.current = data.players || { ...playersRef.current, [data.player_id]: data.player };
+        setPlayers(playersRef.current);
         break;
 
       case 'ready_to_start':
@@ -166,13 +193,19 @@ const CrimeGeoGuesser = () => {
         setCurrentRound(data.round);
         setTotalRounds(data.total_rounds);
         setStreetViewUrl(data.location.street_view_url);
-        setCrimeStats(data.location.crime_stats || []);
+        setCrimeStats((data.location.crime_counts || []).map(([type, count]) => ({
+          crime_type: chartLookupsRef.current.crime_types[type],
+          count,
+          color: chartLookupsRef.current.crime_colors[type],
+        })));
         setZipCode(data.location.zip_code || '');
         setTimeLeft(30);
         setHasGuessed(false);
         setMyGuess(null);
         setRoundResults(null);
+        setMyResult(null);
         setActualLocation(null);
+        setNearby(null);
         setImageError(false);
 
         setTimeout(() => {
@@ -181,11 +214,15 @@ const CrimeGeoGuesser = () => {
         }, 100);
         break;
 
-      case 'round_end':
+      case 'round_end': {
         console.log('Round ended, showing results...');
+        // leaderboard rows are [player_id, rank, round_score, total_score, distance_km, guess_lat, guess_lng]
+        const results = data.leaderboard.map(toResult);
         setGameState('round_end');
-        setRoundResults(data.results);
+        setRoundResults(results);
+        setPlayerCount(data.player_count);
         setActualLocation(data.actual_location);
+        setNearby(data.nearby || null);
 
         setTimeout(() => {
           if (mapInstanceRef.current && data.actual_location && window.L) {
@@ -209,12 +246,27 @@ const CrimeGeoGuesser = () => {
               }).addTo(mapInstanceRef.current);
               actualMarker.bindPopup('Actual Crime Location').openPopup();
 
-              data.results.forEach((result) => {
+              // the closest other incidents around the actual location
+              (data.nearby?.incidents || []).forEach((incident) => {
+                L.circleMarker([incident.latitude, incident.longitude], {
+                  radius: 5,
+                  color: '#F59E0B',
+                  weight: 1,
+                  fillOpacity: 0.8,
+                })
+                  .bindTooltip(incident.description || 'Unknown incident')
+                  .addTo(mapInstanceRef.current);
+              });
+
+              // players who ran out of time have no guess to draw
+              const guessed = results.filter((result) => result.guess);
+
+              guessed.forEach((result) => {
                 const guessLat = result.guess.latitude;
                 const guessLng = result.guess.longitude;
                 const actualLat = data.actual_location.latitude;
                 const actualLng = data.actual_location.longitude;
-                const isCurrentPlayer = result.player_id === playerId;
+                const isCurrentPlayer = result.player_id === playerIdRef.current;
 
                 console.log('Adding marker for:', result.player_name, 'isCurrentPlayer:', isCurrentPlayer);
 
@@ -260,7 +312,7 @@ const CrimeGeoGuesser = () => {
 
               const bounds = L.latLngBounds([
                 [data.actual_location.latitude, data.actual_location.longitude],
-                ...data.results.map(r => [r.guess.latitude, r.guess.longitude])
+                ...guessed.map(r => [r.guess.latitude, r.guess.longitude])
               ]);
               mapInstanceRef.current.fitBounds(bounds, { padding: [80, 80] });
 
@@ -270,6 +322,12 @@ const CrimeGeoGuesser = () => {
           }
         }, 100);
         break;
+      }
+
+      case 'round_result':
+        // only sent to players outside the broadcast leaderboard
+        setMyResult(toResult(data.result));
+        break;
 
       case 'game_end':
         setGameState('game_end');
@@ -278,8 +336,10 @@ const CrimeGeoGuesser = () => {
 
       case 'player_left':
         setError(data.message);
-        if (data.players) {
-          setPlayers(data.players);
+        if (data.player_id) {
+          const { [data.player_id]: _left, ...remaining } = playersRef.current;
+          playersRef.current = remaining;
+          setPlayers(remaining);
         }
         if (gameState !== 'lobby') {
           setTimeout(() => {
@@ -374,7 +434,7 @@ const CrimeGeoGuesser = () => {
       return;
     }
     console.log('Sending create_room event...');
-    sendSocketEvent('create_room', { player_name: playerName });
+    sendSocketEvent('create_room', { player_name: playerName, max_players: roomSize });
   };
 
   const joinRoom = () => {
@@ -475,6 +535,18 @@ const CrimeGeoGuesser = () => {
 
           {error && <p className="text-red-500 text-sm mb-4">{error}</p>}
 
+          <select
+            value={roomSize}
+            onChange={(e) => setRoomSize(Number(e.target.value))}
+            className="w-full px-4 py-3 border border-gray-300 rounded-lg mb-3 text-gray-800 focus:outline-none focus:ring-2 focus:ring-blue-500"
+          >
+            {[2, 4, 8, 30, 100, 200].map((size) => (
+              <option key={size} value={size}>
+                {size === 2 ? '1 vs 1' : `Up to ${size} players`}
+              </option>
+            ))}
+          </select>
+
           <button
             onClick={createRoom}
             className="w-full bg-blue-600 hover:bg-blue-700 text-white font-bold py-3 rounded-lg mb-3 transition"
@@ -511,7 +583,7 @@ const CrimeGeoGuesser = () => {
   }
 
   if (gameState === 'lobby') {
-    const playerCount = Object.keys(players).length;
+    const lobbyCount = Object.keys(players).length;
 
     return (
       <div className="min-h-screen bg-gradient-to-br from-blue-900 via-purple-900 to-pink-900 flex items-center justify-center p-4">
@@ -520,7 +592,7 @@ const CrimeGeoGuesser = () => {
           <p className="text-center text-gray-600 mb-6">Share this code with your friend!</p>
 
           <div className="bg-gray-100 rounded-lg p-4 mb-6">
-            <h3 className="font-bold mb-2 text-gray-700">Players ({playerCount}/2):</h3>
+            <h3 className="font-bold mb-2 text-gray-700">Players ({lobbyCount}/{maxPlayers}):</h3>
             {Object.values(players).map((player, idx) => (
               <div key={idx} className="flex items-center mb-2">
                 <div className="w-3 h-3 bg-green-500 rounded-full mr-2"></div>
@@ -528,7 +600,7 @@ const CrimeGeoGuesser = () => {
                 {idx === 0 && <span className="ml-2 text-xs bg-blue-100 text-blue-800 px-2 py-1 rounded">Host</span>}
               </div>
             ))}
-            {playerCount < 2 && (
+            {lobbyCount < 2 && (
               <div className="flex items-center mb-2 text-gray-400">
                 <div className="w-3 h-3 border-2 border-gray-400 rounded-full mr-2"></div>
                 <span className="italic">Waiting for player...</span>
@@ -538,7 +610,7 @@ const CrimeGeoGuesser = () => {
 
           {error && <p className="text-red-500 text-sm mb-4 text-center">{error}</p>}
 
-          {playerCount === 2 ? (
+          {lobbyCount >= 2 ? (
             <button
               onClick={startGame}
               className="w-full bg-green-600 hover:bg-green-700 text-white font-bold py-3 rounded-lg transition"
@@ -681,17 +753,43 @@ const CrimeGeoGuesser = () => {
                 <div className="flex justify-between items-center mb-2">
                   <span className="font-bold text-lg">{result.player_name}</span>
                   <span className={result.player_id === playerId ? 'text-yellow-400' : ''}>
+                    {playerCount > 2 ? `#${result.rank} ` : ''}
                     {result.player_id === playerId ? '(You)' : ''}
                   </span>
                 </div>
                 <div className="text-sm">
-                  <p>Distance: {result.distance_km} km</p>
+                  <p>{result.distance_km === null ? 'No guess in time' : `Distance: ${result.distance_km} km`}</p>
                   <p className="text-green-400">Round Score: +{result.round_score}</p>
                   <p className="text-xl font-bold mt-2">Total: {result.total_score}</p>
                 </div>
               </div>
             ))}
 
+            {myResult && (
+              <div className="rounded-lg p-4 mb-4 bg-blue-700">
+                <div className="flex justify-between items-center mb-2">
+                  <span className="font-bold text-lg">{playerName}</span>
+                  <span className="text-yellow-400">#{myResult.rank} of {playerCount} (You)</span>
+                </div>
+                <div className="text-sm">
+                  <p>{myResult.distance_km === null ? 'No guess in time' : `Distance: ${myResult.distance_km} km`}</p>
+                  <p className="text-green-400">Round Score: +{myResult.round_score}</p>
+                  <p className="text-xl font-bold mt-2">Total: {myResult.total_score}</p>
+                </div>
+              </div>
+            )}
+
+            {nearby && nearby.total > 0 && (
+              <div className="rounded-lg p-4 mb-4 bg-gray-700 text-sm">
+                <h4 className="font-bold mb-2">
+                  Within {nearby.radius_m} m: {nearby.total.toLocaleString()} incidents
+                </h4>
+                {Object.entries(nearby.counts).map(([category, count]) => (
+                  <p key={category}>{category}: {count.toLocaleString()}</p>
+                ))}
+              </div>
+            )}
+
             <button
               onClick={nextRound}
               className="w-full bg-blue-600 hover:bg-blue-700 text-white font-bold py-3 rounded-lg mt-4 transition"
@@ -1,4 +1,9 @@
-import { useState } from "react";
+import { useEffect, useRef, useState } from "react";
+import { MapContainer, TileLayer, GeoJSON, Pane } from "react-leaflet";
+import type { Feature, FeatureCollection } from "geojson";
+import type { Layer, PathOptions } from "leaflet";
+
+const API_BASE = "https://camp-service-353447914077.us-east4.run.app";
 
 const categories = [
   { label: "ASSAULT", value: "ASSAULT" },
@@ -12,30 +17,228 @@ const categories = [
   { label: "VEHICLE THEFT", value: "VEHICLE THEFT" },
 ];
 
+const boroughs = ["", "Bronx", "Brooklyn", "Manhattan", "Queens", "Staten Island"];
+
+const hourRanges = [
+  { label: "All hours", value: "" },
+  { label: "Morning (6-11)", value: "6-11" },
+  { label: "Afternoon (12-17)", value: "12-17" },
+  { label: "Evening (18-23)", value: "18-23" },
+  { label: "Overnight (0-5)", value: "0-5" },
+];
+
+type Filters = {
+  start: string;
+  end: string;
+  hours: string;
+  borough: string;
+};
+
+const NO_FILTERS: Filters = { start: "", end: "", hours: "", borough: "" };
+
+type CategoryCounts = {
+  category: string;
+  filters: Record<string, unknown>;
+  counts: Record<string, number>;
+  max: number;
+  total: number;
+};
+
+// same palette and number of bins folium's Choropleth used
+const YL_OR_RD = ["#ffffb2", "#fed976", "#feb24c", "#fd8d3c", "#f03b20", "#bd0026"];
+
+function colorFor(count: number, max: number) {
+  if (max <= 0) return YL_OR_RD[0];
+  const bin = Math.floor((count / max) * YL_OR_RD.length);
+  return YL_OR_RD[Math.min(YL_OR_RD.length - 1, bin)];
+}
+
 export default function Maps() {
   const [selected, setSelected] = useState(categories[0].value);
+  const [filters, setFilters] = useState<Filters>(NO_FILTERS);
+  const [shapes, setShapes] = useState<FeatureCollection | null>(null);
+  const [counts, setCounts] = useState<CategoryCounts | null>(null);
+  const [error, setError] = useState("");
+  const [hotspots, setHotspots] = useState(false);
+  // counts are tiny, keep every category + filter combination we've seen so switching back is instant
+  const countsCache = useRef<Record<string, CategoryCounts>>({});
+
+  useEffect(() => {
+    fetch(`${API_BASE}/maps/nta.geojson`)
+      .then((res) => {
+        if (!res.ok) throw new Error("Data is still loading. Please try again shortly.");
+        return res.json();
+      })
+      .then((data: FeatureCollection) => setShapes(data))
+      .catch((e: Error) => setError(e.message));
+  }, []);
+
+  const query = new URLSearchParams({ category: selected });
+  (Object.keys(filters) as (keyof Filters)[]).forEach((name) => {
+    if (filters[name]) query.set(name, filters[name]);
+  });
+  const queryString = query.toString();
+
+  useEffect(() => {
+    const cached = countsCache.current[queryString];
+    if (cached) {
+      setCounts(cached);
+      return;
+    }
+
+    const controller = new AbortController();
+    fetch(`${API_BASE}/maps/counts?${queryString}`, {
+      signal: controller.signal,
+    })
+      .then(async (res) => {
+        if (res.status === 400) throw new Error(await res.text());
+        if (!res.ok) throw new Error("Data is still loading. Please try again shortly.");
+        return res.json();
+      })
+      .then((data: CategoryCounts) => {
+        countsCache.current[queryString] = data;
+        setCounts(data);
+        setError("");
+      })
+      .catch((e: Error) => {
+        if (e.name !== "AbortError") setError(e.message);
+      });
+
+    return () => controller.abort();
+  }, [queryString]);
+
+  const setFilter = (name: keyof Filters, value: string) =>
+    setFilters((current) => ({ ...current, [name]: value }));
+
+  const styleFeature = (feature?: Feature): PathOptions => {
+    const id = String(feature?.properties?.NTA2020 ?? "");
+    const count = counts?.counts[id] ?? 0;
+    return {
+      fillColor: colorFor(count, counts?.max ?? 0),
+      // let the street level tiles show through the neighborhood fill
+      fillOpacity: hotspots ? 0.25 : 0.8,
+      color: "#000",
+      weight: 1,
+      opacity: 0.3,
+    };
+  };
+
+  const bindTooltip = (feature: Feature, layer: Layer) => {
+    const id = String(feature.properties?.NTA2020 ?? "");
+    const name = feature.properties?.NTAName ?? id;
+    const count = counts?.counts[id] ?? 0;
+    layer.bindTooltip(`Neighborhood: ${name}<br/>Incidents: ${count.toLocaleString()}`, {
+      sticky: true,
+    });
+  };
 
   return (
     <div className="w-screen h-screen flex flex-col bg-black text-white">
       <h1 className="text-4xl text-center mt-4">NYC Crime Map</h1>
 
-      <select
-        className="mt-4 mx-auto p-2 border rounded bg-gray-800 text-white border-gray-700"
-        value={selected}
-        onChange={(e) => setSelected(e.target.value)}
-      >
-        {categories.map((c) => (
-          <option key={c.value} value={c.value}>
-            {c.label}
-          </option>
-        ))}
-      </select>
-
-      <iframe
-        src={`https://camp-service-353447914077.us-east4.run.app/maps/heatmap?category=${selected}`}
-        style={{ width: "100%", height: "90%", border: "none" }}
-        title="NYC Crime Map"
-      />
+      <div className="mt-4 mx-auto flex flex-wrap gap-2 justify-center">
+        <select
+          className="p-2 border rounded bg-gray-800 text-white border-gray-700"
+          value={selected}
+          onChange={(e) => setSelected(e.target.value)}
+        >
+          {categories.map((c) => (
+            <option key={c.value} value={c.value}>
+              {c.label}
+            </option>
+          ))}
+        </select>
+
+        <select
+          className="p-2 border rounded bg-gray-800 text-white border-gray-700"
+          value={filters.borough}
+          onChange={(e) => setFilter("borough", e.target.value)}
+        >
+          {boroughs.map((b) => (
+            <option key={b} value={b}>
+              {b || "All boroughs"}
+            </option>
+          ))}
+        </select>
+
+        <select
+          className="p-2 border rounded bg-gray-800 text-white border-gray-700"
+          value={filters.hours}
+          onChange={(e) => setFilter("hours", e.target.value)}
+        >
+          {hourRanges.map((h) => (
+            <option key={h.value} value={h.value}>
+              {h.label}
+            </option>
+          ))}
+        </select>
+
+        <input
+          type="month"
+          className="p-2 border rounded bg-gray-800 text-white border-gray-700"
+          value={filters.start}
+          onChange={(e) => setFilter("start", e.target.value)}
+        />
+        <input
+          type="month"
+          className="p-2 border rounded bg-gray-800 text-white border-gray-700"
+          value={filters.end}
+          onChange={(e) => setFilter("end", e.target.value)}
+        />
+
+        <label className="p-2 flex items-center gap-2">
+          <input type="checkbox" checked={hotspots} onChange={(e) => setHotspots(e.target.checked)} />
+          Street-level hot spots
+        </label>
+      </div>
+
+      {error && <p className="text-center text-red-400 mt-2">{error}</p>}
+
+      <div className="relative mt-4" style={{ width: "100%", height: "90%" }}>
+        <MapContainer
+          center={[40.7128, -74.006]}
+          zoom={11}
+          style={{ width: "100%", height: "100%" }}
+        >
+          <TileLayer
+            attribution='&copy; OpenStreetMap contributors &copy; CARTO'
+            url="https://{s}.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}{r}.png"
+          />
+          {shapes && counts && (
+            // remount per category / filter so the tooltips pick up the new counts
+            <GeoJSON
+              key={`${counts.category}:${JSON.stringify(counts.filters)}:${hotspots}`}
+              data={shapes}
+              style={styleFeature}
+              onEachFeature={bindTooltip}
+            />
+          )}
+          {hotspots && (
+            // above the neighborhood shapes (overlay pane is 400). Tiles count every incident of
+            // the category, the borough / hour / month filters only apply to the shapes
+            <Pane name="hotspots" style={{ zIndex: 450 }}>
+              <TileLayer
+                key={selected}
+                url={`${API_BASE}/tiles/${encodeURIComponent(selected)}/{z}/{x}/{y}.png`}
+                minZoom={10}
+                maxZoom={18}
+              />
+            </Pane>
+          )}
+        </MapContainer>
+
+        {counts && (
+          <div className="absolute bottom-6 right-4 z-[1000] bg-black bg-opacity-70 p-3 rounded text-sm">
+            <p className="font-bold mb-1">{counts.category} Incidents</p>
+            {YL_OR_RD.map((color, i) => (
+              <div key={color} className="flex items-center">
+                <span className="inline-block w-4 h-3 mr-2" style={{ backgroundColor: color }} />
+                {Math.round((counts.max * i) / YL_OR_RD.length).toLocaleString()}+
+              </div>
+            ))}
+          </div>
+        )}
+      </div>
     </div>
   );
-}
\ No newline at end of file
+}